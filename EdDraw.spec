@@ -5,7 +5,7 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('assetts', 'assetts')],
+    datas=[('assets.rcc', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,106 @@
+# assets.py
+#Every image the app shows, decoded once at startup and handed out as shared QImage/QPixmap/QIcon instances
+#Assets are read from assets.rcc, the compiled Qt resource bundle of assetts/ (assets.qrc, rebuilt by build_assets.py),
+#which Qt memory-maps - startup opens that one file instead of one per image
+#Without the bundle the loose files in assetts/ are read instead, still once each
+#Images are decoded in parallel on worker threads, pixmaps and icons are made from them on the GUI thread when first asked for
+#Sources are drawn far larger than they are shown (icons are 36-44 px) - the bundle stores them scaled down,
+#loose files are scaled while decoding
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QDir, QResource, QSize
+from PySide6.QtGui import QIcon, QImage, QImageReader, QPixmap
+
+ASSET_DIR = "assetts"
+BUNDLE = "assets.rcc"
+BUNDLE_ROOT = ":/" + ASSET_DIR
+MAX_SIDE = 256  # Shorter edge of a decoded image, enough for icons and cursors at 5x pixel ratio
+
+#For finding resource path on different machines
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller. """
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(sys._MEIPASS, relative_path)
+    return os.path.join(os.path.abspath("."), relative_path)
+
+#Every frame of an image file, largest first (an .ico holds one per size)
+#Frames are converted to the premultiplied format pixmaps use, so making a pixmap on the GUI thread is a plain copy
+def decode(path, premultiply=True):
+    reader = QImageReader(path)
+    frames = []
+    for i in range(max(reader.imageCount(), 1)):
+        if i and not reader.jumpToImage(i):
+            break
+        size = reader.size()
+        shorter = min(size.width(), size.height())
+        if shorter > MAX_SIDE:
+            reader.setScaledSize(QSize(round(size.width() * MAX_SIDE / shorter), round(size.height() * MAX_SIDE / shorter)))
+        image = reader.read()
+        if not image.isNull():
+            if premultiply and image.hasAlphaChannel():
+                image.convertTo(QImage.Format_ARGB32_Premultiplied)
+            frames.append(image)
+    return sorted(frames, key=lambda image: -image.width())
+
+class AssetRegistry:
+    def __init__(self):
+        self.images = {}  # File name: decoded frames
+        self.pixmaps = {}
+        self.icons = {}
+        self.source = None  # Bundle or folder the assets were read from, None until loaded
+        self.load_seconds = 0.0
+
+    #Register the bundle if there is one - returns the folder to list assets from
+    def open_source(self, use_bundle=True):
+        bundle = resource_path(BUNDLE)
+        if use_bundle and os.path.exists(bundle) and QResource.registerResource(bundle):
+            return BUNDLE_ROOT
+        return resource_path(ASSET_DIR)
+
+    #Decode every asset on a pool of workers - done once at startup, or by the first lookup if nothing loaded them
+    def load(self, use_bundle=True, workers=None):
+        started = time.perf_counter()
+        self.source = self.open_source(use_bundle)
+        names = QDir(self.source).entryList(QDir.Files, QDir.Name)
+        with ThreadPoolExecutor(workers or min(8, os.cpu_count() or 1)) as pool:
+            decoded = pool.map(decode, [f"{self.source}/{name}" for name in names])
+            self.images = dict(zip(names, decoded))
+        self.pixmaps.clear()
+        self.icons.clear()
+        self.load_seconds = time.perf_counter() - started
+
+    def frames(self, name):
+        if self.source is None:
+            self.load()
+        return self.images.get(name) or [QImage()]
+
+    #Largest frame of an asset, a null image if there is no such asset
+    def image(self, name):
+        return self.frames(name)[0]
+
+    def pixmap(self, name):
+        pixmap = self.pixmaps.get(name)
+        if pixmap is None:
+            pixmap = self.pixmaps[name] = QPixmap.fromImage(self.image(name))
+        return pixmap
+
+    #Icon with every frame of the asset, so Qt picks the closest size
+    def icon(self, name):
+        icon = self.icons.get(name)
+        if icon is None:
+            icon = self.icons[name] = QIcon()
+            for frame in self.frames(name):
+                icon.addPixmap(QPixmap.fromImage(frame))
+        return icon
+
+    #Bytes of the decoded images and the pixmaps made from them
+    def byte_size(self):
+        images = sum(frame.sizeInBytes() for frames in self.images.values() for frame in frames)
+        pixmaps = sum(pixmap.width() * pixmap.height() * pixmap.depth() // 8 for pixmap in self.pixmaps.values())
+        return images + pixmaps
+
+assets = AssetRegistry()
@@ -0,0 +1,79 @@
+# bench_backends.py
+#Render backends side by side: full raster rebuild, presenting every tile to a window-sized target, and live stroke drawing
+#Usage: QT_QPA_PLATFORM=offscreen python benchmarks/bench_backends.py [stroke counts...]
+#The opengl backend needs a GL driver (Mesa llvmpipe works) and is reported as unavailable without one
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PySide6.QtCore import Qt, QRect, QRectF
+from PySide6.QtGui import QColor, QGuiApplication, QImage, QPainter, QPen
+
+from bench_redraw import SCREEN_SIZE, build_store, timed
+from board import Board
+from render_backend import BACKENDS, use_backend
+from stroke_store import pen_damage_rect
+
+LIVE_SEGMENTS = 500
+
+#Copy every tile onto a window-sized image, the way paintEvent does after a full rebuild
+def present(board, target):
+    painter = QPainter(target)
+    board.tiles.blit(painter, target.rect())
+    painter.end()
+
+#Short polylines drawn into the tiles and copied out one damage rect at a time, the way draw_last_segment works
+def live_draw(board, target):
+    pen = QPen(QColor(255, 88, 88), 5, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+    for i in range(LIVE_SEGMENTS):
+        x, y = 200 + i * 3 % 1500, 300 + (i * 7) % 600
+        damage = pen_damage_rect(QRectF(x, y, 6, 4), 5)
+
+        def draw(painter):
+            painter.setPen(pen)
+            painter.drawLine(x, y, x + 6, y + 4)
+
+        board.tiles.paint(damage, draw)
+        painter = QPainter(target)
+        board.tiles.blit(painter, damage)
+        painter.end()
+
+def run(stroke_counts):
+    bounds = QRect(0, 0, *SCREEN_SIZE)
+    target = QImage(*SCREEN_SIZE, QImage.Format_ARGB32_Premultiplied)
+    results = []
+    for stroke_count in stroke_counts:
+        store, strokes = build_store(stroke_count)
+        for name in BACKENDS:
+            if use_backend(name).name != name:
+                results.append({"strokes": stroke_count, "backend": name, "available": False})
+                continue
+            board = Board()
+            for stroke in strokes:
+                board.add_stroke(stroke)
+            results.append({
+                "strokes": stroke_count,
+                "backend": name,
+                "available": True,
+                "rebuild_s": timed(board.redraw_all, bounds),
+                "present_s": timed(present, board, target),
+                "live_s": timed(live_draw, board, target),
+                "tile_bytes": board.tiles.byte_size(),
+            })
+    use_backend("raster")
+    return results
+
+if __name__ == "__main__":
+    app = QGuiApplication(sys.argv[:1])
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000]
+    print(f"{'strokes':>8} {'backend':>8} {'rebuild':>9} {'present':>9} {'live x' + str(LIVE_SEGMENTS):>9} {'tile MB':>8}")
+    for result in run(counts):
+        if not result["available"]:
+            print(f"{result['strokes']:>8} {result['backend']:>8}   unavailable")
+            continue
+        print(f"{result['strokes']:>8} {result['backend']:>8} {result['rebuild_s']:>8.3f}s {result['present_s']:>8.3f}s "
+              f"{result['live_s']:>8.3f}s {result['tile_bytes'] / 2**20:>8.1f}")
+    sys.stdout.flush()
+    os._exit(0)
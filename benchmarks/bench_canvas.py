@@ -0,0 +1,256 @@
+# bench_canvas.py
+#DrawingCanvas hot paths end to end: pen input (mouseMoveEvent, the per-frame flush, draw_last_segment),
+#erase_at against the number of strokes on the board, redraw_all_strokes and move_to_screen
+#Runs headless on the offscreen platform with two 1920x1080 screens - transparent_canvas stands in for the Win32 calls off Windows
+#Memory held per subsystem (see memory_budget.py) is recorded with both screens filled
+#Pen input is driven by Replay at full speed, from synthetic strokes or a recorded lesson (a saved .eddraw board, its busiest screen)
+#Usage: python benchmarks/bench_canvas.py [--strokes 500 2000] [--recorded lesson.eddraw] [--render-backend raster] [--json results.json]
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+SCREEN_LAYOUT = {"screens": [
+    {"name": "BENCH-1", "x": 0, "y": 0, "width": 1920, "height": 1080, "logicalDpi": 96, "logicalBaseDpi": 96, "dpr": 1},
+    {"name": "BENCH-2", "x": 1920, "y": 0, "width": 1920, "height": 1080, "logicalDpi": 96, "logicalBaseDpi": 96, "dpr": 1},
+]}
+ERASE_PROBES = 200  # erase_at calls per stroke count
+REPEATS = 5  # Runs of each whole-board timing, the median is reported
+MB = 1024 * 1024
+
+#The offscreen platform with the bench screens, unless a platform was picked already - must be set before the QApplication
+def use_offscreen_platform():
+    if "QT_QPA_PLATFORM" in os.environ:
+        return
+    layout, path = tempfile.mkstemp(suffix=".json", prefix="eddraw-screens-")
+    with os.fdopen(layout, "w") as out:
+        json.dump(SCREEN_LAYOUT, out)
+    os.environ["QT_QPA_PLATFORM"] = f"offscreen:configfile={path}"
+
+#Milliseconds percentiles of a list of samples
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    pick = lambda fraction: ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+    return {"count": len(ordered), "mean_ms": sum(ordered) / len(ordered), "p50_ms": pick(0.5), "p90_ms": pick(0.9),
+            "p99_ms": pick(0.99), "max_ms": ordered[-1]}
+
+def median_ms(function, *args):
+    runs = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(*args)
+        runs.append((time.perf_counter() - start) * 1000)
+    return sorted(runs)[len(runs) // 2]
+
+#Time every call of owner.name into samples (ms) until the returned function is called
+def instrument(owner, name, samples):
+    method = getattr(owner, name)
+
+    def timed_call(*args):
+        start = time.perf_counter()
+        result = method(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+        return result
+
+    setattr(owner, name, timed_call)
+    return lambda: setattr(owner, name, method)
+
+#The app's windows, wired the way main.py does it
+def build_canvas(render_backend):
+    from background_layer import BackgroundLayer
+    from dock_tab import DockTab
+    from main import DrawingCanvas
+    from menu_ui import MenuWindow
+
+    background = BackgroundLayer()
+    canvas = DrawingCanvas(render_backend)
+    menu = MenuWindow(canvas)
+    tab = DockTab(canvas, menu)
+    canvas.parent_menu = menu
+    canvas.background_layer = background
+    menu.dock_tab = tab
+    canvas.disable_passthrough()
+    return canvas
+
+#Empty annotations on every screen, as after a fresh start
+def reset(canvas):
+    from monitor_canvas import MonitorCanvases
+
+    canvas.monitors = MonitorCanvases(canvas.monitors.budget)
+    canvas.activate_monitor(canvas.monitor_key)
+
+#Random-walk strokes in Replay's form, drawn at 125 Hz with a short pause between strokes
+def synthetic_workload(stroke_count):
+    from bench_redraw import POINTS_PER_STROKE, pen_for
+    from bench_stroke_memory import synthetic_strokes
+
+    strokes = []
+    clock = 0
+    for i, points in enumerate(synthetic_strokes(stroke_count, POINTS_PER_STROKE)):
+        color, width = pen_for(i)
+        times = [clock + j * 8 for j in range(len(points))]
+        clock = times[-1] + 300
+        strokes.append((color.rgba(), width, False, points, times))
+    return strokes
+
+def recorded_workload(canvas, path):
+    from replay import recorded_strokes
+
+    canvas.open_session(path)
+    #The lesson is the screen with the most ink, wherever it was drawn
+    board = max((monitor.board for monitor in canvas.monitors.monitors.values()),
+                key=lambda board: len(board.strokes) + len(board.pending or ()))
+    strokes = recorded_strokes(board)
+    reset(canvas)
+    return strokes
+
+#Pen input through the canvas's own handlers and input filters - latency of each move event, each frame's flush and each raster update
+def bench_drawing(canvas, strokes):
+    from replay import Replay
+
+    reset(canvas)
+    moves, frames, segments = [], [], []
+    restore = [instrument(canvas, "mouseMoveEvent", moves), instrument(canvas.frame_clock, "flush", frames),
+               instrument(canvas, "draw_last_segment", segments)]
+    events, seconds = Replay(canvas, strokes, raw_input=False).start(0)
+    for undo in restore:
+        undo()
+    return {"strokes": len(strokes), "events": events, "seconds": seconds, "events_per_frame": canvas.frame_clock.events_per_frame,
+            "mouseMoveEvent": percentiles(moves), "frame_flush": percentiles(frames), "draw_last_segment": percentiles(segments)}
+
+#Fill the active board straight through the stroke store, without the input path
+def fill_board(canvas, strokes):
+    from PySide6.QtGui import QColor
+
+    store = canvas.stroke_store
+    for color, width, dot, points, times in strokes:
+        stroke = store.begin_stroke(QColor.fromRgba(color), width, *points[0])
+        for x, y in points[1:]:
+            store.add_point(stroke, x, y)
+        canvas.board.add_stroke(stroke)
+    canvas.redraw_all_strokes()
+
+#erase_at at points on strokes (hits) and between them (mostly misses)
+def bench_erase(canvas, strokes):
+    from PySide6.QtCore import QPointF
+
+    reset(canvas)
+    fill_board(canvas, strokes)
+    rng = random.Random(2)
+    probes = []
+    for i in range(ERASE_PROBES):
+        if i % 2:
+            probes.append(QPointF(rng.uniform(0, 1920), rng.uniform(0, 1080)))
+        else:
+            points = rng.choice(strokes)[3]
+            probes.append(QPointF(*points[len(points) // 2]))
+
+    samples = []
+    before = len(canvas.board.strokes)
+    restore = instrument(canvas, "erase_at", samples)
+    for probe in probes:
+        canvas.erase_at(probe)
+    restore()
+    return {"strokes": before, "erased": before - len(canvas.board.strokes), "erase_at": percentiles(samples)}
+
+#Full redraw of the board, and switching screens with rasters kept and after they were evicted
+def bench_redraw_and_screens(canvas, strokes):
+    reset(canvas)
+    first, second = canvas.screen_geometries[0], canvas.screen_geometries[-1]
+    canvas.move_to_screen(first)
+    fill_board(canvas, strokes)
+    canvas.move_to_screen(second)
+    fill_board(canvas, strokes)
+    canvas.move_to_screen(first)
+
+    def switch():
+        canvas.move_to_screen(second)
+        canvas.move_to_screen(first)
+
+    def switch_evicted():
+        for monitor in canvas.monitors.monitors.values():
+            monitor.board.evict()
+        switch()
+
+    return {"strokes": len(strokes), "redraw_all_strokes_ms": median_ms(canvas.redraw_all_strokes),
+            "move_to_screen_ms": median_ms(switch) / 2, "move_to_screen_evicted_ms": median_ms(switch_evicted) / 2,
+            "screens": len(canvas.screen_geometries)}
+
+def run(stroke_counts, recorded=None, render_backend="raster"):
+    from PySide6 import __version__ as pyside_version
+    from PySide6.QtGui import QGuiApplication
+
+    canvas = build_canvas(render_backend)
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pyside": pyside_version,
+        "platform": QGuiApplication.platformName(),
+        "os": platform.platform(),
+        "render_backend": canvas.render_backend.name,
+        "drawing": [],
+        "erase": [],
+        "redraw": [],
+        "memory": [],
+    }
+    workloads = [("synthetic", synthetic_workload(count)) for count in stroke_counts]
+    if recorded:
+        workloads.append(("recorded", recorded_workload(canvas, recorded)))
+
+    for name, strokes in workloads:
+        results["drawing"].append({"workload": name, **bench_drawing(canvas, strokes)})
+        results["erase"].append({"workload": name, **bench_erase(canvas, strokes)})
+        results["redraw"].append({"workload": name, **bench_redraw_and_screens(canvas, strokes)})
+        results["memory"].append({"workload": name, **canvas.memory.stats()})
+    reset(canvas)
+    return results
+
+def report(results):
+    print(f"platform {results['platform']}, render backend {results['render_backend']}")
+    print(f"{'workload':>10} {'strokes':>8} {'move p50':>9} {'p99':>8} {'frame p50':>10} {'p99':>8} {'segment p99':>12}")
+    for entry in results["drawing"]:
+        print(f"{entry['workload']:>10} {entry['strokes']:>8} {entry['mouseMoveEvent']['p50_ms']:>7.3f}ms "
+              f"{entry['mouseMoveEvent']['p99_ms']:>6.3f}ms {entry['frame_flush']['p50_ms']:>8.3f}ms "
+              f"{entry['frame_flush']['p99_ms']:>6.3f}ms {entry['draw_last_segment']['p99_ms']:>10.3f}ms")
+    print(f"{'workload':>10} {'strokes':>8} {'erase p50':>10} {'p99':>8} {'redraw':>9} {'screen':>8} {'evicted':>9}")
+    for erase, redraw in zip(results["erase"], results["redraw"]):
+        print(f"{erase['workload']:>10} {erase['strokes']:>8} {erase['erase_at']['p50_ms']:>8.3f}ms "
+              f"{erase['erase_at']['p99_ms']:>6.3f}ms {redraw['redraw_all_strokes_ms']:>7.1f}ms "
+              f"{redraw['move_to_screen_ms']:>6.1f}ms {redraw['move_to_screen_evicted_ms']:>7.1f}ms")
+    print(f"{'workload':>10} {'memory':>9} " + " ".join(f"{subsystem:>14}" for subsystem in results["memory"][0]["subsystems"]))
+    for entry in results["memory"]:
+        print(f"{entry['workload']:>10} {entry['total'] / MB:>7.1f}MB "
+              + " ".join(f"{usage['bytes'] / MB:>12.2f}MB" for usage in entry["subsystems"].values()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strokes", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--recorded", help="saved .eddraw board to replay as a recorded workload")
+    parser.add_argument("--render-backend", default="raster")
+    parser.add_argument("--json", default="bench_canvas.json", help="where to write the results")
+    args = parser.parse_args()
+
+    use_offscreen_platform()
+    recorded = args.recorded and os.path.abspath(args.recorded)
+    output = os.path.abspath(args.json)
+    os.chdir(ROOT)  # Assets are found relative to the working directory
+
+    from PySide6.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    results = run(args.strokes, recorded, args.render_backend)
+    report(results)
+    with open(output, "w") as out:
+        json.dump(results, out, indent=2)
+    print(f"results written to {output}")
+    sys.stdout.flush()
+    os._exit(0)
@@ -0,0 +1,119 @@
+# bench_redraw.py
+#Full redraw time: the original per-segment QPainterPath loop against render_strokes drawing from the point buffer
+#Antialiased stroking of the pens is most of both. The old loop drew paths it kept for every stroke, render_strokes builds
+#its polygons from the shared buffer on each draw, so it comes out a little slower (0.8-0.9x at 1000 strokes offscreen on Linux).
+#That is the cost of the compact point buffer - caching polygons per stroke to win it back measured no faster
+#Usage: QT_QPA_PLATFORM=offscreen python benchmarks/bench_redraw.py [stroke counts...]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PySide6.QtCore import Qt, QPointF
+from PySide6.QtGui import QColor, QGuiApplication, QPainter, QPainterPath, QPen, QPixmap
+
+from bench_stroke_memory import synthetic_strokes
+from stroke_store import StrokeStore, render_strokes
+
+SCREEN_SIZE = (1920, 1080)
+POINTS_PER_STROKE = 60
+
+#Palette and widths the menu offers, cycled so pens change the way they do in a lesson
+COLORS = [(255, 144, 38), (151, 51, 151), (69, 194, 235), (255, 88, 88), (0, 0, 0)]
+WIDTHS = [5, 10, 15, 20]
+
+def pen_for(i):
+    #Teachers draw several strokes before switching pen, so keep runs of 8
+    run = i // 8
+    return QColor(*COLORS[run % len(COLORS)]), WIDTHS[(run // len(COLORS)) % len(WIDTHS)]
+
+#Strokes the way DrawingCanvas stored them before StrokeStore: lists of 40 point paths
+class LegacyStroke:
+    def __init__(self, color, width):
+        self.color = color
+        self.width = width
+        self.segments = []
+
+def build_legacy(stroke_count):
+    strokes = []
+    for i, points in enumerate(synthetic_strokes(stroke_count, POINTS_PER_STROKE)):
+        stroke = LegacyStroke(*pen_for(i))
+        path = QPainterPath()
+        path.moveTo(QPointF(*points[0]))
+        for j, point in enumerate(points[1:], 1):
+            path.lineTo(QPointF(*point))
+            if j % 40 == 0:
+                stroke.segments.append(path)
+                path = QPainterPath()
+                path.moveTo(QPointF(*point))
+        stroke.segments.append(path)
+        strokes.append(stroke)
+    return strokes
+
+def build_store(stroke_count):
+    store = StrokeStore()
+    strokes = []
+    for i, points in enumerate(synthetic_strokes(stroke_count, POINTS_PER_STROKE)):
+        stroke = store.begin_stroke(*pen_for(i), *points[0])
+        for point in points[1:]:
+            store.add_point(stroke, *point)
+        strokes.append(stroke)
+    return store, strokes
+
+#The redraw loop as it was in DrawingCanvas.redraw_all_strokes
+def legacy_redraw(pixmap, strokes):
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+    for stroke in strokes:
+        for segment in stroke.segments:
+            if isinstance(segment, tuple):
+                pen = QPen(stroke.color, stroke.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+                painter.setPen(pen)
+                painter.drawLine(segment[0], segment[1])
+            else:
+                pen = QPen(stroke.color, stroke.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+                painter.setPen(pen)
+                painter.drawPath(segment)
+    painter.end()
+
+def engine_redraw(pixmap, strokes):
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+    render_strokes(painter, strokes)
+    painter.end()
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def run(stroke_counts):
+    pixmap = QPixmap(*SCREEN_SIZE)
+    results = []
+    for stroke_count in stroke_counts:
+        legacy = build_legacy(stroke_count)
+        legacy_time = timed(legacy_redraw, pixmap, legacy)
+        del legacy
+
+        store, strokes = build_store(stroke_count)
+        engine_time = timed(engine_redraw, pixmap, strokes)
+        results.append({
+            "strokes": stroke_count,
+            "legacy_s": legacy_time,
+            "engine_s": engine_time,
+        })
+    return results
+
+if __name__ == "__main__":
+    app = QGuiApplication(sys.argv[:1])
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+    print(f"{'strokes':>8} {'legacy':>10} {'engine':>10} {'speedup':>8}")
+    for result in run(counts):
+        print(f"{result['strokes']:>8} {result['legacy_s']:>9.3f}s {result['engine_s']:>9.3f}s "
+              f"{result['legacy_s'] / result['engine_s']:>7.2f}x")
+    sys.stdout.flush()
+    os._exit(0)
@@ -0,0 +1,95 @@
+# bench_startup.py
+#Startup cost of getting the app's images ready: the old per-file loading against the asset registry (assets.py)
+#  per-file         what startup did before the registry - a QIcon/QPixmap per use, each reading and decoding its PNG
+#  registry-files   the registry decoding the loose files in assetts/ in parallel
+#  registry-bundle  the registry decoding from the memory-mapped assets.rcc bundle in parallel
+#Each run is a fresh process, so plugin loading and first decodes are included, the median of the runs is reported
+#load is the startup phase, first_use is handing out every icon and pixmap the windows need, drawn at their size
+#Usage: python benchmarks/bench_startup.py [--runs 7] [--json startup.json]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MODES = ("per-file", "registry-files", "registry-bundle")
+
+#Images the windows load at startup, and the size each is drawn at
+STARTUP_ICONS = ["comp_draw.png", "undo.png", "eraser.png", "trash_can.png", "eye_on.png", "eye_off.png", "trans_board.png",
+                 "white_board.png", "black_board.png", "green_board.png", "btn_x.png", "comp_control.png", "eddraw_icon.ico"]
+STARTUP_PIXMAPS = ["shadow_menu.png", "shadow_tab.png", "arrow_outer.png", "arrow_inner.png", "eraser_pointer.png"]
+ICON_SIZE = 36
+
+#One timed startup in this process - returns (load ms, first use ms)
+def run_mode(mode):
+    from PySide6.QtGui import QGuiApplication, QIcon, QPixmap
+
+    app = QGuiApplication(sys.argv[:1])
+    from assets import ASSET_DIR, assets, resource_path
+
+    start = time.perf_counter()
+    if mode == "per-file":
+        icons = [QIcon(resource_path(f"{ASSET_DIR}/{name}")) for name in STARTUP_ICONS]
+        pixmaps = [QPixmap(resource_path(f"{ASSET_DIR}/{name}")) for name in STARTUP_PIXMAPS]
+    else:
+        assets.load(use_bundle=mode == "registry-bundle")
+    loaded = time.perf_counter()
+    if mode != "per-file":
+        icons = [assets.icon(name) for name in STARTUP_ICONS]
+        pixmaps = [assets.pixmap(name) for name in STARTUP_PIXMAPS]
+    #QIcon decodes on first draw, so every icon is rendered at button size to compare like for like
+    for icon in icons:
+        icon.pixmap(ICON_SIZE, ICON_SIZE)
+    done = time.perf_counter()
+    if any(pixmap.isNull() for pixmap in pixmaps):
+        raise SystemExit(f"{mode}: an asset failed to load")
+    return (loaded - start) * 1000, (done - loaded) * 1000
+
+def median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+def run(runs):
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    results = {"runs": runs, "bundle": os.path.exists(os.path.join(ROOT, "assets.rcc")), "modes": {}}
+    for mode in MODES:
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode], cwd=ROOT, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+        load = [sample[0] for sample in samples]
+        first_use = [sample[1] for sample in samples]
+        results["modes"][mode] = {"load_ms": median(load), "first_use_ms": median(first_use),
+                                  "total_ms": median([a + b for a, b in zip(load, first_use)])}
+    return results
+
+def report(results):
+    print(f"{'mode':>16} {'load':>9} {'first use':>10} {'total':>9}   (median of {results['runs']} runs)")
+    for mode, entry in results["modes"].items():
+        print(f"{mode:>16} {entry['load_ms']:>7.1f}ms {entry['first_use_ms']:>8.1f}ms {entry['total_ms']:>7.1f}ms")
+    if not results["bundle"]:
+        print("assets.rcc is missing, registry-bundle fell back to the loose files - run build_assets.py")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--json", default="bench_startup.json", help="where to write the results")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(run_mode(args.mode)))
+        sys.stdout.flush()
+        os._exit(0)
+
+    output = os.path.abspath(args.json)
+    results = run(args.runs)
+    report(results)
+    with open(output, "w") as out:
+        json.dump(results, out, indent=2)
+    print(f"results written to {output}")
@@ -0,0 +1,89 @@
+# bench_stroke_memory.py
+#Measures bytes per stored point for the old QPainterPath strokes against the array backed StrokeStore
+#Each layout is built in its own process and measured by resident memory growth, so Qt's heap is included
+#Usage: python benchmarks/bench_stroke_memory.py [strokes] [points_per_stroke]
+
+import os
+import random
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+#Resident memory of this process in bytes (Linux /proc, falls back to peak RSS elsewhere)
+def resident_bytes():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+#Random-walk strokes, the same for every layout
+def synthetic_strokes(stroke_count, points_per_stroke, seed=1):
+    rng = random.Random(seed)
+    for _ in range(stroke_count):
+        x, y = rng.uniform(0, 1900), rng.uniform(0, 1000)
+        points = []
+        for _ in range(points_per_stroke):
+            x += rng.uniform(-3, 3)
+            y += rng.uniform(-3, 3)
+            points.append((x, y))
+        yield points
+
+#Layout before the store: a QColor, a list of 40 point QPainterPaths and a cached QRectF per path
+def build_paths(stroke_count, points_per_stroke):
+    from PySide6.QtCore import QPointF
+    from PySide6.QtGui import QColor, QPainterPath
+
+    strokes = []
+    for points in synthetic_strokes(stroke_count, points_per_stroke):
+        segments, rects = [], []
+        path = QPainterPath()
+        path.moveTo(QPointF(*points[0]))
+        for i, point in enumerate(points[1:], 1):
+            path.lineTo(QPointF(*point))
+            if i % 40 == 0:
+                segments.append(path)
+                rects.append(path.boundingRect())
+                path = QPainterPath()
+                path.moveTo(QPointF(*point))
+        segments.append(path)
+        rects.append(path.boundingRect())
+        strokes.append((QColor(255, 88, 88), 5, segments, rects))
+    return strokes
+
+def build_store(stroke_count, points_per_stroke):
+    from PySide6.QtGui import QColor
+    from stroke_store import StrokeStore
+
+    store = StrokeStore()
+    strokes = []
+    for points in synthetic_strokes(stroke_count, points_per_stroke):
+        stroke = store.begin_stroke(QColor(255, 88, 88), 5, *points[0])
+        for point in points[1:]:
+            store.add_point(stroke, *point)
+        strokes.append(stroke)
+    return store, strokes
+
+def measure(layout, stroke_count, points_per_stroke):
+    import PySide6.QtGui  # noqa: F401 - load Qt before the baseline reading
+    import stroke_store  # noqa: F401
+    before = resident_bytes()
+    built = (build_paths if layout == "paths" else build_store)(stroke_count, points_per_stroke)
+    after = resident_bytes()
+    print((after - before) / (stroke_count * points_per_stroke), flush=True)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--layout":
+        measure(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+        #Skip interpreter teardown, Qt objects are not needed past the reading
+        os._exit(0)
+
+    stroke_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    points_per_stroke = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    print(f"{stroke_count} strokes x {points_per_stroke} points")
+    for layout in ("paths", "store"):
+        result = subprocess.run([sys.executable, __file__, "--layout", layout, str(stroke_count), str(points_per_stroke)],
+                                capture_output=True, text=True, check=True)
+        print(f"{layout:>6}: {float(result.stdout.strip()):.1f} bytes/point")
@@ -0,0 +1,278 @@
+# check_session_file.py
+#Round trips through the session file and the autosave journal, headless on the offscreen platform:
+#save then open, a version 2 file opened and saved again as version 3, damaged directories and stroke data,
+#and journal recovery from records cut short or failing their checksum
+#Prints one line per check and exits with 1 if any failed
+#Usage: python benchmarks/check_session_file.py [--fuzz 600]
+
+import argparse
+import os
+import random
+import struct
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_canvas import use_offscreen_platform
+from bench_redraw import pen_for
+from bench_stroke_memory import synthetic_strokes
+
+SCREEN = (0, 0, 1920, 1080)
+KEYS = ("CHECK-1", "CHECK-2")
+
+failures = []
+
+def check(label, passed, detail=""):
+    print(f"{'ok' if passed else 'FAIL':>4}  {label}" + (f" - {detail}" if detail and not passed else ""))
+    if not passed:
+        failures.append(label)
+
+#Two screens of timed strokes, the oldest ones on the first screen baked into its checkpoint layer
+def build_monitors(stroke_count=60):
+    from PySide6.QtCore import QRect
+    from monitor_canvas import MonitorCanvases
+
+    monitors = MonitorCanvases()
+    for i, points in enumerate(synthetic_strokes(stroke_count, 30, seed=3)):
+        monitor = monitors.get(KEYS[i % len(KEYS)])
+        color, width = pen_for(i)
+        times = [j * 8 for j in range(len(points))]
+        monitor.board.add_stroke(monitor.stroke_store.load_stroke(color, width, points, started=1000 + i * 500, times=times))
+    for monitor in monitors.monitors.values():
+        monitor.board.prepare(QRect(*SCREEN))
+    monitors.get(KEYS[0]).board.bake_strokes(10)
+    return monitors
+
+#What a reopened board must match - every stroke decoded, keyed by order
+def strokes_of(monitors):
+    from session_file import capture_board
+
+    boards = {}
+    for key, monitor in monitors.monitors.items():
+        strokes, tiles, tile_size, flags = capture_board(monitor.board)
+        boards[key] = ({stroke[4]: stroke for stroke in strokes}, len(tiles), flags)
+    return boards
+
+#Same pen, flags, times and points to the 1/16 px the file stores
+def same_strokes(expected, actual):
+    if expected.keys() != actual.keys():
+        return f"orders differ: {sorted(expected.keys() ^ actual.keys())[:5]}"
+    for order, a in expected.items():
+        b = actual[order]
+        if a[0:6] != b[0:6] or a[8:] != b[8:]:
+            return f"stroke {order} differs"
+        if any(abs(x - y) > 1 / 16 for x, y in zip(a[7], b[7])):
+            return f"stroke {order} moved"
+    return ""
+
+def open_monitors(path):
+    from monitor_canvas import MonitorCanvases
+    from session_file import Session
+
+    monitors = MonitorCanvases()
+    Session(path).load_into(monitors)
+    return monitors
+
+def check_round_trip(directory):
+    from session_file import save_session
+
+    monitors = build_monitors()
+    path = os.path.join(directory, "board.eddraw")
+    save_session(path, monitors)
+    expected = strokes_of(monitors)
+    opened = open_monitors(path)
+    pending = sum(len(monitor.board.pending.grid.item_cells) for monitor in opened.monitors.values() if monitor.board.pending)
+    check("open leaves strokes encoded", pending == 60, f"{pending} pending")
+    actual = strokes_of(opened)
+    for key in KEYS:
+        check(f"save -> open, {key}", same_strokes(expected[key][0], actual[key][0]) == "" and expected[key][1:] == actual[key][1:],
+              same_strokes(expected[key][0], actual[key][0]) or f"tiles/flags {expected[key][1:]} vs {actual[key][1:]}")
+
+    #Saving an opened board before anything is decoded copies the encoded strokes as they are
+    again = os.path.join(directory, "again.eddraw")
+    save_session(again, open_monitors(path))
+    actual = strokes_of(open_monitors(again))
+    check("open -> save undecoded -> open", all(same_strokes(expected[key][0], actual[key][0]) == "" for key in KEYS))
+    return path
+
+#A version 2 file of board: no baked strokes, no monitor flags - its baked tiles are pixels only
+def write_v2(path, monitors):
+    from session_file import (COLOR, COUNT, FLAG_DOT, FLAG_TIMED, HEADER, MAGIC, STROKE_ENTRY, TILE_ENTRY, TRAILER, V2_MONITOR,
+                              capture_board, encode_points)
+    from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+
+    palette = {}
+    boards = []
+    with open(path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, 2, 0))
+        stroke_entries, tile_entries = [], []
+        for key, monitor in monitors.monitors.items():
+            strokes, tiles, tile_size, _ = capture_board(monitor.board)
+            strokes = [stroke for stroke in strokes if not stroke[3]]
+            for color, width, dot, baked, order, point_count, bounds, coords, started, deltas in strokes:
+                data = encode_points(coords, started, deltas)
+                flags = FLAG_TIMED | (FLAG_DOT if dot else 0)
+                stroke_entries.append(STROKE_ENTRY.pack(out.tell(), len(data), point_count, palette.setdefault(color, len(palette)), flags,
+                                                        width, order, *bounds))
+                out.write(data)
+            for (column, row), image in tiles:
+                data = QByteArray()
+                buffer = QBuffer(data)
+                buffer.open(QIODevice.WriteOnly)
+                image.save(buffer, "PNG")
+                tile_entries.append(TILE_ENTRY.pack(out.tell(), data.size(), column, row))
+                out.write(data.data())
+            boards.append((key, len(strokes), len(tiles), tile_size))
+        directory = out.tell()
+        out.write(COUNT.pack(len(palette)))
+        for color in palette:
+            out.write(COLOR.pack(color))
+        out.write(COUNT.pack(len(boards)))
+        for key, stroke_count, tile_count, tile_size in boards:
+            name = key.encode("utf-8")
+            out.write(COUNT.pack(len(name)) + name)
+            out.write(V2_MONITOR.pack(stroke_count, tile_count, tile_size))
+        out.writelines(stroke_entries)
+        out.writelines(tile_entries)
+        out.write(TRAILER.pack(directory, MAGIC))
+
+def check_version_2(directory):
+    from session_file import MONITOR_PIXEL_BAKED, save_session
+
+    path = os.path.join(directory, "v2.eddraw")
+    write_v2(path, build_monitors())
+    opened = open_monitors(path)
+    board = opened.get(KEYS[0]).board
+    check("v2 baked tiles open pixel-only", not board.rebakeable and board.has_pixel_ink())
+    check("v2 other screen stays rebakeable", opened.get(KEYS[1]).board.rebakeable)
+    expected = strokes_of(opened)
+
+    resaved = os.path.join(directory, "v3.eddraw")
+    save_session(resaved, opened)
+    actual = strokes_of(open_monitors(resaved))
+    check("v2 -> v3 keeps the strokes", all(same_strokes(expected[key][0], actual[key][0]) == "" for key in KEYS))
+    check("v2 -> v3 keeps the pixel-only flag", actual[KEYS[0]][2] & MONITOR_PIXEL_BAKED and not actual[KEYS[1]][2] & MONITOR_PIXEL_BAKED)
+
+#Opening must either work or raise ValueError, and strokes that don't decode are dropped rather than raising while painting
+def attempt(directory, data):
+    path = tempfile.mktemp(suffix=".eddraw", dir=directory)
+    with open(path, "wb") as out:
+        out.write(data)
+    try:
+        monitors = open_monitors(path)
+    except ValueError:
+        return "rejected"
+    for monitor in monitors.monitors.values():
+        monitor.board.realize_all()
+    return "opened"
+
+def check_damage(directory, path, fuzz):
+    from session_file import TRAILER
+
+    with open(path, "rb") as board:
+        good = board.read()
+    (offset, _) = TRAILER.unpack_from(good, len(good) - TRAILER.size)
+
+    def damaged(change):
+        data = bytearray(good)
+        change(data)
+        return attempt(directory, bytes(data))
+
+    check("directory offset past the end", damaged(lambda data: struct.pack_into("<Q", data, len(data) - TRAILER.size, len(data) + 50)) == "rejected")
+    check("directory offset shifted", damaged(lambda data: struct.pack_into("<Q", data, len(data) - TRAILER.size, offset + 3)) == "rejected")
+    check("file cut short", attempt(directory, good[:len(good) // 2]) == "rejected")
+
+    #The first stroke entry points at the first byte after the header
+    entry = good.index(struct.pack("<Q", 8), offset)
+    check("stroke data outside the file", damaged(lambda data: struct.pack_into("<Q", data, entry, 1 << 40)) == "rejected")
+    length = struct.unpack_from("<I", good, entry + 8)[0]
+
+    def garble(data):
+        data[8:8 + length] = b"\xff" * length
+    check("stroke data that doesn't decode", damaged(garble) == "opened")
+
+    rng = random.Random(1)
+    unexpected = []
+    for n in range(fuzz):
+        data = bytearray(good)
+        for _ in range(4):
+            data[rng.randrange(offset if n % 2 else 8, len(data))] = rng.randrange(256)
+        try:
+            attempt(directory, bytes(data))
+        except Exception as error:
+            unexpected.append(f"{n}: {type(error).__name__} {error}")
+    check(f"{fuzz} randomly damaged files open or raise ValueError", not unexpected, "; ".join(unexpected[:3]))
+
+def check_journal(directory):
+    from journal import Journal, journal_path
+    from monitor_canvas import MonitorCanvases
+
+    journal_directory = os.path.join(directory, "autosave")
+    monitors = build_monitors()
+    journal = Journal(journal_directory, sync_interval=0)
+    journal.recover(MonitorCanvases())  # Creates the folder, as at startup
+    journal.start(monitors)
+    monitor = monitors.get(KEYS[1])
+    added = []
+    for i, points in enumerate(synthetic_strokes(5, 20, seed=4)):
+        color, width = pen_for(i)
+        stroke = monitor.stroke_store.load_stroke(color, width, points)
+        monitor.board.add_stroke(stroke)
+        journal.add_stroke(KEYS[1], stroke)
+        added.append(stroke.order)
+    removed = monitor.board.strokes[0]
+    monitor.board.remove_stroke(removed)
+    journal.remove_stroke(KEYS[1], removed)
+    journal.stop()
+    check("journal written", journal.error is None, str(journal.error))
+    expected = strokes_of(monitors)
+
+    def recovered():
+        monitors = MonitorCanvases()
+        Journal(journal_directory).recover(monitors)
+        return strokes_of(monitors)
+
+    actual = recovered()
+    check("journal recovery", all(same_strokes(expected[key][0], actual[key][0]) == "" for key in KEYS),
+          "; ".join(same_strokes(expected[key][0], actual[key][0]) for key in KEYS))
+
+    #Cut into the last record (the erase) - recovery stops before it, so the erased stroke is back
+    log = journal_path(journal_directory, 0)
+    with open(log, "rb") as records:
+        data = records.read()
+    with open(log, "wb") as records:
+        records.write(data[:-3])
+    actual = recovered()[KEYS[1]][0]
+    check("torn last record is dropped", removed.order in actual and added[-1] in actual)
+
+    #A bad checksum on the third add stops recovery there
+    from journal import CRC, RECORD
+    offset = 0
+    for _ in range(2):
+        length = RECORD.unpack_from(data, offset)[0]
+        offset += RECORD.size + length + CRC.size
+    corrupt = bytearray(data)
+    corrupt[offset + RECORD.size + 2] ^= 0xFF
+    with open(log, "wb") as records:
+        records.write(corrupt)
+    actual = recovered()[KEYS[1]][0]
+    check("bad checksum stops recovery", added[1] in actual and added[2] not in actual and added[-1] not in actual)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fuzz", type=int, default=600, help="randomly damaged files to open")
+    args = parser.parse_args()
+
+    use_offscreen_platform()
+    from PySide6.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+
+    with tempfile.TemporaryDirectory(prefix="eddraw-check-") as directory:
+        path = check_round_trip(directory)
+        check_version_2(directory)
+        check_damage(directory, path, args.fuzz)
+        check_journal(directory)
+    print(f"{len(failures)} failed" if failures else "all passed")
+    sys.stdout.flush()
+    os._exit(1 if failures else 0)
@@ -0,0 +1,221 @@
+# board.py
+#One generation of ink on the canvas: its strokes, their spatial index, and the rasters they are drawn into
+#Clearing the canvas swaps in a new Board, so undoing a clear just swaps the old one back
+
+from bisect import insort
+from functools import partial
+from itertools import chain
+
+from PySide6.QtCore import QRect
+
+from spatial_index import SpatialGrid
+from stroke_store import render_strokes
+from tile_store import TileStore
+
+class Board:
+    def __init__(self):
+        self.strokes = []
+        self.stroke_index = SpatialGrid()
+        self.tiles = TileStore()
+
+        #Checkpoint layer - baked strokes are drawn once into baked_tiles and left out of redraws
+        #Their points stay indexed so the eraser can still find them, erasing one re-bakes the tiles under it
+        #Strokes ordered at or below baked_through belong to this layer, even when undo brings one back
+        self.baked_tiles = TileStore()
+        self.baked = []
+        self.baked_index = SpatialGrid()
+        self.baked_through = -1
+
+        #False when the baked tiles came from a file that only kept their pixels - that ink can't be re-baked, so it can't be erased
+        self.rebakeable = True
+
+        #Canvas area the rasters were last built for
+        self.bounds = QRect()
+
+        #Strokes opened from a session file that have not been decoded yet, see session_file.PendingStrokes
+        self.pending = None
+
+    #Get the rasters ready to show on a canvas area - packed baked tiles are decoded, live tiles rebuilt if they were made for another area or evicted
+    #Returns True if the live raster had to be rebuilt
+    def prepare(self, bounds):
+        if self.baked_tiles.packed:
+            self.baked_tiles.expand()
+        if self.bounds == bounds:
+            return False
+        self.redraw_all(bounds)
+        return True
+
+    #Drop the live raster, it is rebuilt from the strokes by prepare() - returns the bytes freed
+    def evict(self):
+        freed = self.tiles.byte_size()
+        self.tiles.clear()
+        self.bounds = QRect()
+        return freed
+
+    #Pack the baked layer, it is expanded again before it is drawn - returns the bytes freed
+    def compress(self):
+        before = self.baked_tiles.byte_size()
+        self.baked_tiles.compress()
+        return before - self.baked_tiles.byte_size()
+
+    #Raster memory held by this board, in bytes
+    def raster_bytes(self):
+        return self.tiles.byte_size() + self.baked_tiles.byte_size()
+
+    #Decode the saved strokes touching rect and rasterize them in place - returns the area that changed
+    def realize(self, rect):
+        if not self.pending:
+            return QRect()
+        strokes = self.pending.take(rect)
+        if not self.pending:
+            self.pending = None
+        area = QRect()
+        for stroke, baked in strokes:
+            self.load_stroke(stroke, baked)
+            area = area.united(stroke.bounding_rect())
+        return self.redraw_region(area) if strokes else area
+
+    #Decode every saved stroke still pending (before saving, for one)
+    def realize_all(self):
+        if self.pending:
+            for stroke, baked in self.pending.take_all():
+                self.load_stroke(stroke, baked)
+            self.pending = None
+            if not self.bounds.isEmpty():
+                self.redraw_all(self.bounds)
+
+    #Add a new stroke on top
+    def add_stroke(self, stroke):
+        self.strokes.append(stroke)
+        self.index_stroke(stroke)
+
+    #Put a removed stroke back at its original depth - one from before the last checkpoint goes back into the baked layer
+    def restore_stroke(self, stroke):
+        if stroke.order > self.baked_through:
+            insort(self.strokes, stroke, key=lambda stroke: stroke.order)
+            self.index_stroke(stroke)
+            return
+        self.add_baked(stroke)
+        if self.rebakeable:
+            self.rebake(stroke.bounding_rect())
+        else:
+            self.paint_strokes_by_tile(self.baked_tiles, [stroke])
+
+    #Take a stroke off the board - a baked one has the baked tiles under it re-baked without it
+    #The live raster is not touched, callers redraw the stroke's area afterwards
+    def remove_stroke(self, stroke):
+        if stroke.order > self.baked_through:
+            self.strokes.remove(stroke)
+            self.stroke_index.remove(stroke)
+            return
+        self.baked.remove(stroke)
+        self.baked_index.remove(stroke)
+        self.rebake(stroke.bounding_rect())
+
+    #Place a stroke decoded from a session file - ones saved as baked are already in the baked tiles, so they are only indexed
+    #Anything else is restored, which also paints it into the baked layer if a checkpoint has since passed it
+    def load_stroke(self, stroke, baked):
+        if baked:
+            self.add_baked(stroke)
+        else:
+            self.restore_stroke(stroke)
+
+    def add_baked(self, stroke):
+        insort(self.baked, stroke, key=lambda stroke: stroke.order)
+        for segment in range(stroke.segment_count()):
+            self.baked_index.insert(stroke, stroke.segment_ink_rect(segment))
+
+    #Live and baked strokes, baked first
+    def all_strokes(self):
+        return chain(self.baked, self.strokes)
+
+    #True while the baked tiles hold ink with no strokes behind it - it can be shown as it is but not drawn again
+    def has_pixel_ink(self):
+        return not self.rebakeable and bool(self.baked_tiles.tiles or self.baked_tiles.packed)
+
+    #Strokes that may lie under rect, live and (where they can be re-baked) baked
+    def strokes_near(self, rect):
+        nearby = self.stroke_index.query(rect)
+        if self.rebakeable:
+            nearby |= self.baked_index.query(rect)
+        return nearby
+
+    #Add every segment of a stroke to the spatial index, padded for the pen
+    def index_stroke(self, stroke):
+        for segment in range(stroke.segment_count()):
+            self.stroke_index.insert(stroke, stroke.segment_ink_rect(segment))
+
+    #Move the oldest strokes out of the live list and into the baked raster layer
+    def bake_strokes(self, count):
+        baked = self.strokes[:count]
+        if not baked:
+            return baked
+        if self.baked_tiles.packed:
+            self.baked_tiles.expand()
+        self.paint_strokes_by_tile(self.baked_tiles, baked)
+        del self.strokes[:count]
+        for stroke in baked:
+            self.stroke_index.remove(stroke)
+            self.add_baked(stroke)
+        self.baked_through = max(self.baked_through, baked[-1].order)
+        return baked
+
+    #Keep only the baked layer's pixels - its strokes are dropped from the board and returned for the caller to release
+    #The layer is pixel-only from then on, like one opened from an older file, so it can't be re-baked or erased from
+    def flatten_baked(self):
+        flattened = self.baked
+        self.baked = []
+        self.baked_index.clear()
+        self.rebakeable = False
+        return flattened
+
+    #Clear rect of the baked layer and paint the baked strokes overlapping it back, in order
+    def rebake(self, rect):
+        if self.baked_tiles.packed:
+            self.baked_tiles.expand()
+        strokes = sorted(self.baked_index.query(rect), key=lambda stroke: stroke.order)
+        strokes = [stroke for stroke in strokes if stroke.bounding_rect().intersects(rect)]
+        self.baked_tiles.repaint(rect, partial(self.draw_strokes, strokes, None, rect), lambda tile_rect: bool(self.baked_index.query(tile_rect)))
+
+    #The baked checkpoint layer is copied in first, then the live strokes on top
+    def redraw_all(self, bounds):
+        self.bounds = QRect(bounds)
+        self.tiles.clear()
+        self.paint_strokes_by_tile(self.tiles, self.strokes, self.baked_tiles)
+
+    #Paint strokes into a tile store, bucketed per tile so each tile is opened once
+    #Tiles from base (the baked layer) are copied under the strokes
+    def paint_strokes_by_tile(self, tiles, strokes, base=None):
+        buckets = {}
+        if base is not None:
+            for key in base.tiles:
+                buckets[key] = []
+        for stroke in strokes:
+            for key in tiles.tile_keys(stroke.bounding_rect().intersected(self.bounds)):
+                buckets.setdefault(key, []).append(stroke)
+
+        for key, bucket in buckets.items():
+            tiles.paint_tile(key, partial(self.draw_strokes, bucket, base, tiles.tile_rect(key)))
+
+    #Re-rasterize only rect - the baked layer and the strokes overlapping it are repainted in order, clipped to rect
+    #Returns the area that changed
+    def redraw_region(self, rect):
+        rect = rect.intersected(self.bounds)
+        if rect.isEmpty():
+            return rect
+        strokes = sorted(self.stroke_index.query(rect), key=lambda stroke: stroke.order)
+        strokes = [stroke for stroke in strokes if stroke.bounding_rect().intersects(rect)]
+        self.tiles.repaint(rect, partial(self.draw_strokes, strokes, self.baked_tiles, rect), self.has_ink)
+        return rect
+
+    #True if any live or baked ink may touch rect
+    def has_ink(self, rect):
+        return bool(self.stroke_index.query(rect)) or self.baked_tiles.has_tiles(rect)
+
+    #Paint a list of strokes in order, over the baked layer inside rect when one is given
+    def draw_strokes(self, strokes, base, rect, painter):
+        if base is not None:
+            if painter.hasClipping():
+                rect = rect.intersected(painter.clipBoundingRect().toAlignedRect())
+            base.blit(painter, rect)
+        render_strokes(painter, strokes)
@@ -0,0 +1,59 @@
+# build_assets.py
+#Rebuild the asset bundle after adding or changing anything in assetts/
+#Every file in assetts/ is staged - PNGs larger than the app draws them are scaled down to assets.MAX_SIDE, the rest copied -
+#then listed in a .qrc and compiled with Qt's rcc into assets.rcc, which assets.py loads
+#Files are stored uncompressed (the PNGs already are) so Qt serves them straight from the memory-mapped bundle
+#Usage: python build_assets.py
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from PySide6.QtGui import QImageReader
+
+from assets import ASSET_DIR, BUNDLE, decode
+
+#Qt's resource compiler - pyside6-rcc on the PATH, or the rcc shipped inside PySide6
+def find_rcc():
+    rcc = shutil.which("pyside6-rcc")
+    if rcc:
+        return [rcc]
+    import PySide6
+    for candidate in (os.path.join(os.path.dirname(PySide6.__file__), "Qt", "libexec", "rcc"),
+                      os.path.join(os.path.dirname(PySide6.__file__), "rcc.exe")):
+        if os.path.exists(candidate):
+            return [candidate]
+    sys.exit("Couldn't find rcc - install PySide6")
+
+#Copy or scale every asset into directory - returns their names
+def stage(directory):
+    names = sorted(name for name in os.listdir(ASSET_DIR) if os.path.isfile(os.path.join(ASSET_DIR, name)))
+    for name in names:
+        source = os.path.join(ASSET_DIR, name)
+        target = os.path.join(directory, name)
+        frames = decode(source, premultiply=False)
+        if name.lower().endswith(".png") and len(frames) == 1 and frames[0].size() != QImageReader(source).size():
+            if not frames[0].save(target, "PNG"):
+                sys.exit(f"Couldn't write {target}")
+        else:
+            shutil.copyfile(source, target)
+    return names
+
+#Assets keep their assetts/ paths inside the bundle
+def write_qrc(path, names):
+    with open(path, "w") as out:
+        out.write("<!DOCTYPE RCC>\n<RCC version=\"1.0\">\n<qresource prefix=\"/\">\n")
+        for name in names:
+            out.write(f"    <file alias=\"{ASSET_DIR}/{name}\">{name}</file>\n")
+        out.write("</qresource>\n</RCC>\n")
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    bundle = os.path.abspath(BUNDLE)
+    with tempfile.TemporaryDirectory(prefix="eddraw-assets-") as staging:
+        names = stage(staging)
+        write_qrc(os.path.join(staging, "assets.qrc"), names)
+        subprocess.run(find_rcc() + ["--binary", "--no-compress", "assets.qrc", "-o", bundle], cwd=staging, check=True)
+    print(f"{len(names)} assets written to {BUNDLE} ({os.path.getsize(BUNDLE) // 1024} KB)")
@@ -0,0 +1,132 @@
+# cursor_cache.py
+#Drawing and eraser cursors, built once per (color, size, device pixel ratio) and kept
+#The source images come decoded from the asset registry, and the white outline and scaled inner mask are shared by every color,
+#so a new color costs one tint and switching modes never touches the disk
+#The menu's palette is prebuilt one cursor per event loop pass after startup, see prebuild
+
+from PySide6.QtCore import QObject, QTimer, Qt
+from PySide6.QtGui import QColor, QCursor, QImage, QPainter, QPixmap
+
+from memory_budget import pixmap_bytes
+
+CURSOR_SIZE = 42
+ERASER_SIZE = 24
+ERASER = "eraser"  # Key in place of a color for the eraser cursor
+
+#Copy of a mask image filled with color where the mask has alpha
+def tint(mask, color):
+    tinted = QImage(mask.size(), QImage.Format_ARGB32_Premultiplied)
+    tinted.fill(Qt.transparent)
+    painter = QPainter(tinted)
+    painter.setCompositionMode(QPainter.CompositionMode_Source)
+    painter.drawImage(0, 0, mask)
+    painter.setCompositionMode(QPainter.CompositionMode_SourceIn)
+    painter.fillRect(tinted.rect(), color)
+    painter.end()
+    return tinted
+
+#Custom Cursor For Drawing - White outline, color center, from the prepared layers of CursorCache.layers
+def create_layered_cursor(outline, inner, color: QColor, dpr=1.0):
+    final = outline.copy()
+    painter = QPainter(final)
+    painter.drawImage(0, 0, tint(inner, color))
+    painter.end()
+
+    pixmap = QPixmap.fromImage(final)
+    pixmap.setDevicePixelRatio(dpr)
+    #Cursor hotspot - 0,0 = top left
+    return QCursor(pixmap, 0, 0)
+
+#Custom Eraser Cursor - a red ring if the eraser image is missing
+def create_eraser_cursor(source, size=ERASER_SIZE, dpr=1.0):
+    pixels = round(size * dpr)
+    if source.isNull():
+        image = QImage(pixels, pixels, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QColor(255, 88, 88))  # Match your app's red
+        painter.drawEllipse(1, 1, pixels - 2, pixels - 2)
+        painter.end()
+    else:
+        image = source.scaled(pixels, pixels, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    pixmap = QPixmap.fromImage(image)
+    pixmap.setDevicePixelRatio(dpr)
+    return QCursor(pixmap, int(image.width() / dpr) // 2, int(image.height() / dpr) // 2)
+
+class CursorCache(QObject):
+    def __init__(self, outer, inner, eraser_source, parent=None):
+        super().__init__(parent)
+        self.outer = outer
+        self.inner = inner
+        self.eraser_source = eraser_source
+        self.cursors = {}  # (rgba or ERASER, size, dpr): QCursor
+        self.layers = {}  # Pixel size: (white outline, inner mask), scaled from the sources
+        self.misses = 0  # Cursors that had to be built
+
+        #Cursors waiting to be prebuilt
+        self.queue = []
+        self.timer = QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.build_next)
+
+    #Drawing cursor for a pen color
+    def layered(self, color: QColor, size=CURSOR_SIZE, dpr=1.0):
+        return self.get((color.rgba(), size, dpr))
+
+    def eraser(self, size=ERASER_SIZE, dpr=1.0):
+        return self.get((ERASER, size, dpr))
+
+    def get(self, key):
+        cursor = self.cursors.get(key)
+        if cursor is None:
+            cursor = self.cursors[key] = self.build(key)
+        return cursor
+
+    def build(self, key):
+        self.misses += 1
+        color, size, dpr = key
+        if color == ERASER:
+            return create_eraser_cursor(self.eraser_source, size, dpr)
+        return create_layered_cursor(*self.layer_images(round(size * dpr)), QColor.fromRgba(color), dpr)
+
+    #The outline (outer arrow tinted white) and inner mask at a pixel size, shared by every color
+    def layer_images(self, pixels):
+        layers = self.layers.get(pixels)
+        if layers is None:
+            outer = self.outer.scaled(pixels, pixels, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            inner = self.inner.scaled(pixels, pixels, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            outline = QImage(pixels, pixels, QImage.Format_ARGB32_Premultiplied)
+            outline.fill(Qt.transparent)
+            painter = QPainter(outline)
+            painter.drawImage(0, 0, tint(outer, QColor("white")))
+            painter.end()
+            layers = self.layers[pixels] = (outline, inner)
+        return layers
+
+    #Build the drawing cursor of every color, and the eraser, at each pixel ratio - one per event loop pass
+    def prebuild(self, colors, dprs, size=CURSOR_SIZE):
+        for dpr in dprs:
+            self.queue.append((ERASER, ERASER_SIZE, dpr))
+            self.queue.extend((QColor(color).rgba(), size, dpr) for color in colors)
+        self.timer.start()
+
+    def build_next(self):
+        while self.queue:
+            key = self.queue.pop(0)
+            if key not in self.cursors:
+                self.get(key)
+                return
+        self.timer.stop()
+
+    #Bytes of the prepared layers and built cursors - the sources are counted by the asset registry
+    def byte_size(self):
+        size = sum(pixmap_bytes(outline) + pixmap_bytes(inner) for outline, inner in self.layers.values())
+        return size + sum(pixmap_bytes(cursor.pixmap()) for cursor in self.cursors.values())
+
+    #Drop built cursors and layers, they are rebuilt from the sources when next used
+    def clear(self, amount=None):
+        self.cursors.clear()
+        self.layers.clear()
@@ -3,15 +3,9 @@
 
 from PySide6.QtWidgets import QWidget
 from PySide6.QtCore import Qt, QPointF
-from PySide6.QtGui import QPainter, QMouseEvent, QPainterPath, QColor, QPolygonF, QPixmap
-import os
-import sys
+from PySide6.QtGui import QPainter, QMouseEvent, QPainterPath, QColor, QPolygonF
 
-# Support for PyInstaller resource path
-def resource_path(relative_path):
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.join(os.path.abspath("."), relative_path)
+from assets import assets
 
 class DockTab(QWidget):
     def __init__(self, canvas, menu, parent=None):
@@ -56,8 +50,7 @@ class DockTab(QWidget):
             painter.translate(6, 6)  # Offset to center inside drop shadow buffer
 
             #Drop Shadow
-            shadow_pixmap = QPixmap(resource_path("assetts/shadow_tab.png"))
-            painter.drawPixmap(-6, 12, 46, 100, shadow_pixmap)
+            painter.drawPixmap(-6, 12, 46, 100, assets.pixmap("shadow_tab.png"))
 
             # Draw blue rounded tab background
             radius = 10
@@ -116,7 +109,7 @@ class DockTab(QWidget):
             current_y = event.globalPosition().toPoint().y()
             new_y = current_y - self.drag_start_offset
 
-            screen = self.canvas.detect_screen_geometry(self.pos())
+            screen = self.screen_area()
             clamped_y = max(screen.top(), min(screen.bottom() - self.tab_height - self.clamp_y_offset, new_y))
             self.move(self.fixed_x, clamped_y)
 
@@ -139,9 +132,17 @@ class DockTab(QWidget):
         self.menu_visible = not self.menu_visible
         self.update()
 
+    #Area the tab moves in, in the same coordinates as move() - the canvas itself when the tab is composited into it
+    def screen_area(self):
+        if self.parentWidget() is not None:
+            return self.parentWidget().rect()
+        return self.canvas.detect_screen_geometry(self.pos())
+
     #Switch tab to screen menu is on, set new values based on new screen size
     def move_to_screen(self, geometry=None):
-        if geometry is None and hasattr(self.canvas, "detect_screen_geometry"):
+        if self.parentWidget() is not None:
+            geometry = self.parentWidget().rect()
+        elif geometry is None and hasattr(self.canvas, "detect_screen_geometry"):
             geometry = self.canvas.detect_screen_geometry(self.pos())
 
         if geometry:
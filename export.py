@@ -0,0 +1,144 @@
+# export.py
+#Exporting a board to PNG, PDF or SVG on a worker thread
+#The board is captured on the GUI thread (stroke coordinates and baked tiles are copied, see session_file.capture_board)
+#and rendered from that copy into a QImage, QPdfWriter or QSvgGenerator, so inking carries on while the export runs
+#Strokes stay vectors in PDF and SVG, baked checkpoint strokes included - the baked tiles are only placed as images
+#when they hold ink with no strokes behind it (see Board.has_pixel_ink), and then the strokes already in them aren't drawn again
+
+import os
+import threading
+
+from PySide6.QtCore import QMarginsF, QObject, QPointF, QRect, QRunnable, QSize, QSizeF, QThreadPool, Qt, Signal
+from PySide6.QtGui import QColor, QImage, QPageLayout, QPageSize, QPainter, QPdfWriter, QPen, QPolygonF
+
+from session_file import MONITOR_PIXEL_BAKED, capture_board
+
+EXPORT_FILTER = "PNG image (*.png);;PDF document (*.pdf);;SVG drawing (*.svg)"
+FORMATS = (".png", ".pdf", ".svg")
+PROGRESS_STEP = 200  # Strokes drawn between progress reports
+
+class ExportCancelled(Exception):
+    pass
+
+#Signals of an export job - they are emitted on the worker thread and delivered on the thread of whatever is connected
+class ExportSignals(QObject):
+    progress = Signal(int, int)  # Strokes drawn, total
+    finished = Signal(str)  # Path written
+    failed = Signal(str)  # Error message
+    cancelled = Signal()
+
+class ExportJob(QRunnable):
+    def __init__(self, path, captured, size, scale=1.0, background=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.path = path
+        self.strokes, self.tiles, self.tile_size, flags = captured
+        if flags & MONITOR_PIXEL_BAKED and self.tiles:
+            self.strokes = [stroke for stroke in self.strokes if not stroke[3]]
+        else:
+            self.tiles = []
+        self.size = size
+        self.scale = scale  # PNG only, PDF and SVG are vectors at canvas size
+        self.background = background  # Color filled under the ink, None keeps it transparent
+        self.signals = ExportSignals()
+        self.stop = threading.Event()
+
+    def cancel(self):
+        self.stop.set()
+
+    #Output is written beside the target and swapped in, so a cancelled or failed export leaves nothing behind
+    def run(self):
+        extension = os.path.splitext(self.path)[1].lower()
+        temp_path = self.path + ".tmp"
+        try:
+            if extension == ".png":
+                self.export_png(temp_path)
+            elif extension == ".pdf":
+                self.export_pdf(temp_path)
+            elif extension == ".svg":
+                self.export_svg(temp_path)
+            else:
+                raise ValueError(f"Can't export to {extension or 'a file without an extension'} - use PNG, PDF or SVG")
+            os.replace(temp_path, self.path)
+        except ExportCancelled:
+            self.remove(temp_path)
+            self.signals.cancelled.emit()
+        except (OSError, ValueError) as error:
+            self.remove(temp_path)
+            self.signals.failed.emit(str(error))
+        else:
+            self.signals.finished.emit(self.path)
+
+    def remove(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def export_png(self, path):
+        width, height = self.size.width(), self.size.height()
+        image = QImage(max(round(width * self.scale), 1), max(round(height * self.scale), 1), QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.scale(self.scale, self.scale)
+        self.paint(painter)
+        if not image.save(path, "PNG"):
+            raise OSError(f"Couldn't write {path}")
+
+    #One page the size of the canvas, at 72 dpi so a canvas pixel is a point
+    def export_pdf(self, path):
+        writer = QPdfWriter(path)
+        writer.setResolution(72)
+        writer.setPageLayout(QPageLayout(QPageSize(QSizeF(self.size), QPageSize.Point), QPageLayout.Portrait, QMarginsF()))
+        painter = QPainter(writer)
+        if not painter.isActive():
+            raise OSError(f"Couldn't write {path}")
+        self.paint(painter)
+
+    def export_svg(self, path):
+        try:
+            from PySide6.QtSvg import QSvgGenerator
+        except ImportError:
+            raise ValueError("SVG export needs the QtSvg module")
+        generator = QSvgGenerator()
+        generator.setFileName(path)
+        generator.setSize(self.size)
+        generator.setViewBox(QRect(0, 0, self.size.width(), self.size.height()))
+        generator.setTitle("EdDraw board")
+        painter = QPainter(generator)
+        if not painter.isActive():
+            raise OSError(f"Couldn't write {path}")
+        self.paint(painter)
+
+    #Background, baked layer, then strokes in order with the same pens the canvas uses
+    #The painter is always ended here, cancelled or not, so the device lets go of its file
+    def paint(self, painter):
+        try:
+            painter.setRenderHint(QPainter.Antialiasing)
+            if self.background is not None:
+                painter.fillRect(QRect(0, 0, self.size.width(), self.size.height()), self.background)
+            for (column, row), image in self.tiles:
+                painter.drawImage(column * self.tile_size, row * self.tile_size, image)
+
+            total = len(self.strokes)
+            pen_key = None
+            for done, (color, width, dot, baked, order, point_count, bounds, coords, started, deltas) in enumerate(self.strokes):
+                if self.stop.is_set():
+                    raise ExportCancelled()
+                if done % PROGRESS_STEP == 0:
+                    self.signals.progress.emit(done, total)
+                if (color, width) != pen_key:
+                    pen_key = color, width
+                    painter.setPen(QPen(QColor.fromRgba(color), width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+                if dot:
+                    left, top, right, bottom = bounds
+                    painter.drawEllipse(QPointF((left + right) / 2, (top + bottom) / 2), width / 2, width / 2)
+                else:
+                    painter.drawPolyline(QPolygonF([QPointF(coords[i], coords[i + 1]) for i in range(0, len(coords), 2)]))
+            self.signals.progress.emit(total, total)
+        finally:
+            painter.end()
+
+#Capture board and start exporting it to path on pool - connect to job.signals for progress and the result
+def export_board(path, board, size, scale=1.0, background=None, pool=None):
+    job = ExportJob(path, capture_board(board), QSize(size), scale, background)
+    (pool or QThreadPool.globalInstance()).start(job)
+    return job
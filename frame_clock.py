@@ -0,0 +1,58 @@
+# frame_clock.py
+#Paces input handling to the display - pointer events are buffered and flushed at most once per refresh
+#The first event after an idle period is flushed straight away so a new stroke starts without waiting a frame
+
+from PySide6.QtCore import QObject, QTimer, Qt
+
+class FrameClock(QObject):
+    def __init__(self, flush, parent=None):
+        super().__init__(parent)
+        self.flush = flush
+        self.pending = 0
+        self.refresh_rate = 60.0
+
+        #Coalescing counters - events_per_frame is a smoothed average, last_events_per_frame the latest frame
+        self.frames = 0
+        self.events = 0
+        self.events_per_frame = 0.0
+        self.last_events_per_frame = 0
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.set_refresh_rate(self.refresh_rate)
+
+    #Match the frame interval to the screen the canvas is on
+    def set_screen(self, screen):
+        if screen is not None and screen.refreshRate() > 0:
+            self.set_refresh_rate(screen.refreshRate())
+
+    def set_refresh_rate(self, refresh_rate):
+        self.refresh_rate = refresh_rate
+        self.timer.setInterval(max(1, round(1000 / refresh_rate)))
+
+    #An event was buffered
+    def post(self):
+        self.pending += 1
+        if not self.timer.isActive():
+            self.flush_now()
+            self.timer.start()
+
+    #Flush whatever is buffered immediately (press/release keep their order with moves this way)
+    def flush_now(self):
+        if not self.pending:
+            return
+        count = self.pending
+        self.pending = 0
+        self.flush()
+
+        self.frames += 1
+        self.events += count
+        self.last_events_per_frame = count
+        self.events_per_frame += (count - self.events_per_frame) * 0.1
+
+    def tick(self):
+        if self.pending:
+            self.flush_now()
+        else:
+            self.timer.stop()
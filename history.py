@@ -0,0 +1,146 @@
+# history.py
+#Undo/redo command log for the drawing canvas
+#Commands hold references to strokes and boards, never copies, so every entry is small and clear is O(1)
+
+import sys
+from collections import deque
+from itertools import chain
+
+#A stroke was drawn on a board
+class AddStroke:
+    __slots__ = ("board", "stroke")
+
+    def __init__(self, board, stroke):
+        self.board = board
+        self.stroke = stroke
+
+    def undo(self, canvas):
+        canvas.remove_stroke(self.board, self.stroke)
+
+    def redo(self, canvas):
+        canvas.restore_stroke(self.board, self.stroke)
+
+    #An undone stroke that can no longer be redone is gone for good
+    def discard(self, release, applied):
+        if not applied:
+            release(self.stroke)
+
+    def touches(self, strokes):
+        return self.stroke in strokes
+
+    def reaches(self, order):
+        return self.stroke.order <= order
+
+#A stroke was removed with the eraser
+class EraseStroke(AddStroke):
+    __slots__ = ()
+
+    def undo(self, canvas):
+        canvas.restore_stroke(self.board, self.stroke)
+
+    def redo(self, canvas):
+        canvas.remove_stroke(self.board, self.stroke)
+
+    def discard(self, release, applied):
+        if applied:
+            release(self.stroke)
+
+#The canvas was cleared - before and after are whole boards, swapped rather than copied
+class ClearBoard:
+    __slots__ = ("before", "after")
+
+    def __init__(self, before, after):
+        self.before = before
+        self.after = after
+
+    def undo(self, canvas):
+        canvas.activate_board(self.before)
+
+    def redo(self, canvas):
+        canvas.activate_board(self.after)
+
+    def discard(self, release, applied):
+        for stroke in (self.before if applied else self.after).all_strokes():
+            release(stroke)
+
+    def touches(self, strokes):
+        return False
+
+    def reaches(self, order):
+        return False
+
+class History:
+    def __init__(self, release, limit=500):
+        self.release = release  # Called with strokes no command can bring back
+        self.limit = limit
+        self.undo_stack = deque()
+        self.redo_stack = []
+
+    #Record a command that has already been applied
+    def push(self, command):
+        for undone in self.redo_stack:
+            undone.discard(self.release, applied=False)
+        self.redo_stack.clear()
+
+        self.undo_stack.append(command)
+        while len(self.undo_stack) > self.limit:
+            self.undo_stack.popleft().discard(self.release, applied=True)
+
+    def undo(self, canvas):
+        if not self.undo_stack:
+            return False
+        command = self.undo_stack.pop()
+        command.undo(canvas)
+        self.redo_stack.append(command)
+        return True
+
+    def redo(self, canvas):
+        if not self.redo_stack:
+            return False
+        command = self.redo_stack.pop()
+        command.redo(canvas)
+        self.undo_stack.append(command)
+        return True
+
+    #Forget every entry up to the newest one touching strokes (used once strokes are baked)
+    def forget(self, strokes):
+        strokes = set(strokes)
+        self.forget_until(lambda command: command.touches(strokes))
+
+    #Forget every entry up to the newest one on a stroke ordered at or below order (used once the baked layer is flattened)
+    def forget_through(self, order):
+        self.forget_until(lambda command: command.reaches(order))
+
+    def forget_until(self, matches):
+        cut = 0
+        for i, command in enumerate(self.undo_stack):
+            if matches(command):
+                cut = i + 1
+        for _ in range(cut):
+            self.undo_stack.popleft().discard(self.release, applied=True)
+
+    #Boards kept only so a clear can be undone or redone - every one but current
+    def parked_boards(self, current):
+        boards = {}
+        for command in chain(self.undo_stack, self.redo_stack):
+            if isinstance(command, ClearBoard):
+                for board in (command.before, command.after):
+                    if board is not current:
+                        boards[id(board)] = board
+        return list(boards.values())
+
+    #Bytes of the command log itself, and of the rasters of parked boards
+    def byte_size(self, current):
+        records = sum(sys.getsizeof(command) for command in chain(self.undo_stack, self.redo_stack))
+        rasters = sum(board.raster_bytes() for board in self.parked_boards(current))
+        return sys.getsizeof(self.undo_stack) + sys.getsizeof(self.redo_stack) + records + rasters
+
+    #Drop the rasters of parked boards - the live layer is rebuilt and the baked one unpacked when a clear is undone
+    def release_parked(self, current):
+        freed = 0
+        for board in self.parked_boards(current):
+            freed += board.evict() + board.compress()
+        return freed
+
+    def __len__(self):
+        return len(self.undo_stack) + len(self.redo_stack)
@@ -0,0 +1,88 @@
+# hud.py
+#Performance HUD - a small read-out in the canvas corner with frame time, input-to-paint latency and what the board holds
+#PaintStats is fed by the canvas on every input event and paint, the HUD only reads it a few times a second
+
+import time
+
+from PySide6.QtCore import QRect, QTimer, Qt
+from PySide6.QtGui import QColor, QFont, QPainter
+from PySide6.QtWidgets import QWidget
+
+SMOOTHING = 0.1  # Weight of the newest sample in the running averages
+MB = 1024 * 1024
+
+class PaintStats:
+    def __init__(self):
+        self.waiting_since = None  # When the oldest input not yet painted arrived
+        self.last_paint = None
+        self.frame_ms = 0.0  # Between paints that follow input
+        self.paint_ms = 0.0  # Spent inside paintEvent
+        self.latency_ms = 0.0  # Input event to the paint showing it
+        self.worst_latency_ms = 0.0  # Since the HUD last read it
+        self.paints = 0
+
+    def input_arrived(self):
+        if self.waiting_since is None:
+            self.waiting_since = time.perf_counter()
+
+    #A paint that started at started (perf_counter) just finished
+    def painted(self, started):
+        now = time.perf_counter()
+        self.paints += 1
+        self.paint_ms += ((now - started) * 1000 - self.paint_ms) * SMOOTHING
+        if self.waiting_since is None:
+            return
+        latency = (now - self.waiting_since) * 1000
+        self.latency_ms += (latency - self.latency_ms) * SMOOTHING
+        self.worst_latency_ms = max(self.worst_latency_ms, latency)
+        if self.last_paint is not None:
+            self.frame_ms += ((now - self.last_paint) * 1000 - self.frame_ms) * SMOOTHING
+        self.last_paint = now
+        self.waiting_since = None
+
+    #Worst latency since the last call
+    def take_worst_latency(self):
+        worst, self.worst_latency_ms = self.worst_latency_ms, 0.0
+        return worst
+
+class PerformanceHud(QWidget):
+    def __init__(self, canvas, interval=250):
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.lines = []
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setFont(QFont("Consolas", 9))
+        self.resize(230, 134)
+        self.move(12, 12)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(interval)
+        self.refresh()
+        self.show()
+
+    def refresh(self):
+        stats = self.canvas.paint_stats
+        board = self.canvas.board
+        clock = self.canvas.frame_clock
+        memory = self.canvas.memory
+        frame_ms = stats.frame_ms
+        self.lines = [
+            f"frame {frame_ms:6.1f} ms  ({1000 / frame_ms if frame_ms else 0:5.1f} fps)",
+            f"paint {stats.paint_ms:6.2f} ms",
+            f"input to paint {stats.latency_ms:6.1f} ms  worst {stats.take_worst_latency():6.1f}",
+            f"events per frame {clock.events_per_frame:5.1f}",
+            f"strokes {len(board.strokes):6d}  segments {sum(stroke.segment_count() for stroke in board.strokes):7d}",
+            f"points {self.canvas.stroke_store.point_count():8d}",
+            f"memory {memory.total() / MB:6.1f} of {memory.budget / MB:.0f} MB",
+        ]
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(0, 0, 0, 170))
+        painter.setPen(QColor(120, 255, 160))
+        line_height = self.fontMetrics().height()
+        for i, line in enumerate(self.lines):
+            painter.drawText(QRect(8, 6 + i * line_height, self.width() - 16, line_height), Qt.AlignLeft | Qt.AlignVCenter, line)
+        painter.end()
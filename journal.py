@@ -0,0 +1,257 @@
+# journal.py
+#Crash-safe autosave - an append-only log of stroke add/erase/clear events beside a periodic snapshot of every board
+#
+#Files in the autosave folder come in generations:
+#  snapshot-<gen>.eddraw  every monitor's boards, a session file (see session_file.py)
+#  journal-<gen>.log      events since that snapshot, one record each: length, type, payload, crc32
+#A generation's journal is only started once its snapshot is safely on disk, and older files are deleted after that
+#Recovery loads the newest snapshot and replays its journal up to the first torn or corrupt record
+#
+#The GUI thread only copies what changed onto a queue - encoding, writing and fsync happen on a writer thread,
+#which syncs once per batch so a fast run of strokes costs one disk flush
+
+import os
+import queue
+import re
+import struct
+import threading
+import time
+import zlib
+
+from PySide6.QtGui import QColor
+
+from board import Board
+from session_file import FLAG_DOT, FLAG_TIMED, Session, capture_session, claim_orders, decode_points, encode_points, write_session
+
+RECORD = struct.Struct("<IB")  # Payload length, type
+KEY = struct.Struct("<H")  # Monitor key length, the utf-8 key follows
+ADD = struct.Struct("<QIfBI")  # Order, color (ARGB), width, flags, points - the encoded points and times follow
+REMOVE = struct.Struct("<Q")  # Order
+CRC = struct.Struct("<I")
+
+ADD_STROKE = 1
+REMOVE_STROKE = 2
+CLEAR_BOARD = 3
+
+FILE_NAME = re.compile(r"(snapshot|journal)-(\d+)\.(eddraw|log)$")
+
+def snapshot_path(directory, generation):
+    return os.path.join(directory, f"snapshot-{generation:08d}.eddraw")
+
+def journal_path(directory, generation):
+    return os.path.join(directory, f"journal-{generation:08d}.log")
+
+def encode_key(key):
+    name = str(key).encode("utf-8")
+    return KEY.pack(len(name)) + name
+
+def decode_key(payload):
+    (length,) = KEY.unpack_from(payload, 0)
+    return payload[KEY.size:KEY.size + length].decode("utf-8"), KEY.size + length
+
+#Records in a journal file, stopping at the first one that was cut short or doesn't match its checksum
+def read_records(path):
+    with open(path, "rb") as log:
+        data = log.read()
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        length, kind = RECORD.unpack_from(data, offset)
+        end = offset + RECORD.size + length
+        if end + CRC.size > len(data):
+            return
+        (crc,) = CRC.unpack_from(data, end)
+        if zlib.crc32(data[offset + RECORD.size - 1:end]) != crc:
+            return
+        yield kind, data[offset + RECORD.size:end]
+        offset = end + CRC.size
+
+class Journal:
+    def __init__(self, directory, sync_interval=0.5, compact_every=2000):
+        self.directory = directory
+        self.sync_interval = sync_interval  # Seconds of events gathered into one fsync
+        self.compact_every = compact_every  # Records written before the boards are snapshotted again
+        self.generation = 0
+        self.records = 0  # Since the last snapshot
+        self.queue = queue.Queue()
+        self.thread = None
+        self.log = None
+        self.unsynced = False
+        self.syncs = 0
+        self.error = None  # Last write error, the journal keeps trying on later batches
+
+    #Rebuild monitors from the newest snapshot and its journal - returns (events replayed, seconds taken)
+    def recover(self, monitors):
+        started = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        snapshots, journals = [], []
+        for name in os.listdir(self.directory):
+            match = FILE_NAME.match(name)
+            if match:
+                (snapshots if match.group(1) == "snapshot" else journals).append(int(match.group(2)))
+
+        events = 0
+        base = -1
+        for generation in sorted(snapshots, reverse=True):
+            try:
+                Session(snapshot_path(self.directory, generation)).load_into(monitors)
+            except (OSError, ValueError, struct.error):
+                continue
+            base = generation
+            events += 1
+            break
+
+        boards = {}
+        highest = -1
+        for generation in sorted(journals):
+            if generation < base:
+                continue
+            for kind, payload in read_records(journal_path(self.directory, generation)):
+                highest = max(highest, self.replay(monitors, boards, kind, payload))
+                events += 1
+        claim_orders(highest)
+
+        self.generation = max(snapshots + journals, default=-1) + 1
+        return events, time.perf_counter() - started
+
+    #Apply one record - boards maps monitor keys to {order: stroke} for the boards touched so far
+    #Returns the stroke order it used, if any
+    def replay(self, monitors, boards, kind, payload):
+        key, offset = decode_key(payload)
+        monitor = monitors.get(key)
+        strokes = boards.get(key)
+        if strokes is None:
+            monitor.board.realize_all()
+            strokes = boards[key] = {stroke.order: stroke for stroke in monitor.board.all_strokes()}
+
+        if kind == ADD_STROKE:
+            order, color, width, flags, point_count = ADD.unpack_from(payload, offset)
+            if order not in strokes:
+                points, started, times = decode_points(payload[offset + ADD.size:], point_count, bool(flags & FLAG_TIMED))
+                stroke = monitor.stroke_store.load_stroke(QColor.fromRgba(color), width, points, dot=bool(flags & FLAG_DOT), order=order,
+                                                          started=started, times=times)
+                monitor.board.restore_stroke(stroke)
+                strokes[order] = stroke
+            return order
+        if kind == REMOVE_STROKE:
+            (order,) = REMOVE.unpack_from(payload, offset)
+            stroke = strokes.pop(order, None)
+            if stroke is not None:
+                monitor.board.remove_stroke(stroke)
+                monitor.stroke_store.release(stroke)
+            return order
+        if kind == CLEAR_BOARD:
+            for stroke in monitor.board.all_strokes():
+                monitor.stroke_store.release(stroke)
+            monitor.board = Board()
+            strokes.clear()
+        return -1
+
+    #Start writing - the first generation begins with a snapshot of monitors, so recovered boards are compacted too
+    def start(self, monitors=None):
+        self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+        self.thread.start()
+        self.snapshot(monitors)
+
+    #A stroke was finished, restored by redo or brought back by undoing an erase
+    def add_stroke(self, key, stroke):
+        start = stroke.offset * 2
+        coords = stroke.store.coords[start:start + stroke.count * 2]
+        deltas = stroke.store.times[stroke.offset:stroke.offset + stroke.count]
+        self.post((ADD_STROKE, key, stroke.order, stroke.color.rgba(), stroke.width, FLAG_TIMED | (FLAG_DOT if stroke.dot else 0), stroke.count,
+                   coords, stroke.started, deltas))
+
+    #A stroke was erased or its drawing undone
+    def remove_stroke(self, key, stroke):
+        self.post((REMOVE_STROKE, key, stroke.order))
+
+    def clear_board(self, key):
+        self.post((CLEAR_BOARD, key))
+
+    def post(self, event):
+        self.queue.put(event)
+        self.records += 1
+
+    #True once enough records have piled up since the last snapshot
+    def due(self):
+        return self.records >= self.compact_every
+
+    #Capture every board now and have the writer start a new generation from it
+    def snapshot(self, monitors):
+        captured = capture_session(monitors) if monitors is not None else None
+        self.queue.put(("rotate", self.generation, captured))
+        self.generation += 1
+        self.records = 0
+
+    #Clean exit - stop the writer and delete the autosave, there is nothing to recover
+    def discard(self):
+        self.stop()
+        for name in os.listdir(self.directory):
+            if FILE_NAME.match(name):
+                os.remove(os.path.join(self.directory, name))
+
+    #Write out everything queued and wait for the writer to finish
+    def stop(self):
+        if self.thread is None:
+            return
+        self.queue.put(("stop",))
+        self.thread.join()
+        self.thread = None
+
+    #Writer thread - events are gathered for up to sync_interval, written, then synced to disk once
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.sync_interval
+            while batch[-1][0] not in ("rotate", "stop"):
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+
+            try:
+                for event in batch:
+                    if event[0] == "rotate":
+                        self.sync()
+                        self.rotate(*event[1:])
+                    elif event[0] == "stop":
+                        self.sync()
+                        if self.log:
+                            self.log.close()
+                            self.log = None
+                        return
+                    elif self.log:
+                        self.log.write(self.encode(event))
+                        self.unsynced = True
+                self.sync()
+            except OSError as error:
+                self.error = error
+
+    def sync(self):
+        if self.log and self.unsynced:
+            self.log.flush()
+            os.fsync(self.log.fileno())
+            self.unsynced = False
+            self.syncs += 1
+
+    #Write the snapshot for generation, open its journal, then drop every older file
+    def rotate(self, generation, captured):
+        if captured is not None:
+            write_session(snapshot_path(self.directory, generation), captured)
+        if self.log:
+            self.log.close()
+        self.log = open(journal_path(self.directory, generation), "wb")
+        for name in os.listdir(self.directory):
+            match = FILE_NAME.match(name)
+            if match and int(match.group(2)) < generation:
+                os.remove(os.path.join(self.directory, name))
+
+    def encode(self, event):
+        kind, key = event[0:2]
+        payload = encode_key(key)
+        if kind == ADD_STROKE:
+            order, color, width, flags, point_count, coords, started, deltas = event[2:]
+            payload += ADD.pack(order, color, width, flags, point_count) + encode_points(coords, started, deltas)
+        elif kind == REMOVE_STROKE:
+            payload += REMOVE.pack(event[2])
+        header = RECORD.pack(len(payload), kind)
+        return header + payload + CRC.pack(zlib.crc32(header[-1:] + payload))
@@ -4,164 +4,363 @@
 #Using method I learned from CodeMonkey on Youtube https://www.youtube.com/watch?v=XozHdfHrb1U
 #This app was 100% AI assisted (mostly for layout, but also in translating some C# into python), if that is a problem, then please don't use
 
-import sys, os
+import sys, os, time, argparse
 from PySide6.QtWidgets import QApplication
-from PySide6.QtGui import QColor, QPainter, QPen, QPainterPath, QPixmap, QIcon, QCursor
-from PySide6.QtCore import Qt, QPoint
+from PySide6.QtGui import QColor, QPen, QRegion
+from PySide6.QtCore import Qt, QPoint, QPointF, QRectF, QStandardPaths, QTimer
 
 from transparent_canvas import TransparentCanvasWindow
 from menu_ui import MenuWindow
 from dock_tab import DockTab
 from background_layer import BackgroundLayer
+from board import Board
+from history import AddStroke, EraseStroke, ClearBoard
+from monitor_canvas import MonitorCanvases
+from stroke_store import pen_damage_rect
+from stroke_filters import StrokePipeline
+from frame_clock import FrameClock
+from render_backend import BACKENDS, use_backend
+from session_file import Session, save_session
+from journal import Journal
+from export import export_board
+from replay import Replay, recorded_strokes, render_timelapse
+from tracing import span, tracer
+from hud import PaintStats, PerformanceHud
+from memory_budget import MEMORY_BUDGET, MemoryBudget
+from cursor_cache import CursorCache
+from assets import assets
 
 COLOR_GREEN = "rgb(34, 180, 115)"
 COLOR_RED = "rgb(230, 76, 60)"
-
-#For finding resource path on different machines
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and for PyInstaller. """
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.join(os.path.abspath("."), relative_path)
-
-#Custom Cursor For Drawing - White outline, color center
-def create_layered_cursor(outer_path, inner_path, color: QColor, size=42):
-    outer = QPixmap(outer_path).scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-    inner = QPixmap(inner_path).scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-
-    final = QPixmap(size, size)
-    final.fill(Qt.transparent)
-    painter = QPainter(final)
-
-    # Tint outer pointer white
-    tinted_outer = QPixmap(outer.size())
-    tinted_outer.fill(Qt.transparent)
-    outer_painter = QPainter(tinted_outer)
-    outer_painter.setCompositionMode(QPainter.CompositionMode_Source)
-    outer_painter.drawPixmap(0, 0, outer)
-    outer_painter.setCompositionMode(QPainter.CompositionMode_SourceIn)
-    outer_painter.fillRect(tinted_outer.rect(), QColor("white"))
-    outer_painter.end()
-
-    painter.drawPixmap(0, 0, tinted_outer)
-
-    # Tint inner pointer with selected color
-    tinted_inner = QPixmap(inner.size())
-    tinted_inner.fill(Qt.transparent)
-    inner_painter = QPainter(tinted_inner)
-    inner_painter.setCompositionMode(QPainter.CompositionMode_Source)
-    inner_painter.drawPixmap(0, 0, inner)
-    inner_painter.setCompositionMode(QPainter.CompositionMode_SourceIn)
-    inner_painter.fillRect(tinted_inner.rect(), color)
-    inner_painter.end()
-
-    painter.drawPixmap(0, 0, tinted_inner)
-    painter.end()
-
-    #Cursor hotspot - 0,0 = top left
-    return QCursor(final, 0, 0)
-
-#Custom Eraser Cursor
-def create_eraser_cursor(size=24):
-    pixmap = QPixmap(resource_path("assetts/eraser_pointer.png"))
-    
-    if pixmap.isNull():
-        pixmap = QPixmap(size, size)
-        pixmap.fill(Qt.transparent)
-        
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setPen(QColor(255, 88, 88))  # Match your app's red
-        painter.drawEllipse(1, 1, size - 2, size - 2)
-        painter.end()
-    else:
-        pixmap = pixmap.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-
-    hotspot = QPoint(pixmap.width() // 2, pixmap.height() // 2)
-    return QCursor(pixmap, hotspot.x(), hotspot.y())
-
-class Stroke:
-    def __init__(self, color: QColor, width: int):
-        self.color = color
-        self.width = width
-        self.segments = []
+MEMORY_CHECK_MS = 3000  # How often the memory budget is checked
 
 #Canvas for drawing - including all basic functions
 class DrawingCanvas(TransparentCanvasWindow):
-    def __init__(self):
+    def __init__(self, render_backend="raster", autosave_dir=None, memory_budget=MEMORY_BUDGET):
         super().__init__()
+        self.render_backend = use_backend(render_backend)  # Tile surfaces for every board, see render_backend.py
         self.pen_color = QColor(255, 88, 88)
         self.pen_width = 5
-        self.strokes = []
         self.current_stroke = None
-        self.current_path = None
         self.erase_mode = False
-        self.just_cleared = False
         self.current_screen = 0
         self.is_passthrough = True
-        self.points_in_segment = 0
+        self.compositor = False  # Menu, dock tab and background drawn inside this window, see enable_compositor
+        self.show_ink = True
+
+        #Strokes, undo history and rasters are kept per monitor - stroke_store, board and history point at the active one
+        self.monitors = MonitorCanvases()
+        self.full_redraws = 0  # Whole-raster rebuilds, for spotting screen switches that don't reuse a raster
+        self.monitor_key = None
+        self.topology.changed.connect(self.screens_changed)
+
+        #Input samples are deduped and jitter-filtered while drawing, then simplified when the stroke ends
+        self.input_pipeline = StrokePipeline()
+        self.simplify_tolerance = 0.75  # Pixels, 0 turns simplification off
+        self.raw_input = False  # Samples are added as they come, without filtering or simplifying - set by Replay
+
+        #Pointer samples are buffered and flushed once per display refresh
+        self.pending_samples = []
+        self.pending_erase = []
+        self.drawn_points = 0
+        self.frame_clock = FrameClock(self.flush_input, self)
+        self.replay = None  # Replay drawing on this canvas, see replay_board
+
+        #Frame time and input-to-paint latency, shown by the performance HUD (see hud.py, tracing.py for pipeline spans)
+        self.paint_stats = PaintStats()
+        self.hud = None
+
+        #Drawing and eraser cursors are built once per color, size and pixel ratio - see prebuild_cursors
+        self.cursors = CursorCache(assets.image("arrow_outer.png"), assets.image("arrow_inner.png"), assets.image("eraser_pointer.png"), self)
+
+        #Memory accounting - checked every few seconds and after screen switches, caches give memory back when over budget
+        self.memory = MemoryBudget(memory_budget)
+        self.register_memory()
+        self.memory_timer = QTimer(self)
+        self.memory_timer.timeout.connect(self.memory.enforce)
+        self.memory_timer.start(MEMORY_CHECK_MS)
+
+        #Checkpoints - older strokes are baked into a raster layer so undo and redraws only replay recent ink
+        #Baked strokes can no longer be undone, but the eraser still finds them (see Board.rebake) until they hold
+        #baked_point_budget points - then the baked layer keeps only its pixels, so memory stays bounded however long the lesson runs
+        self.live_stroke_cap = 2000  # Most vector strokes kept live
+        self.baked_point_budget = 2_000_000  # Most points kept behind the baked layer for the eraser
+        self.checkpoint_interval = 500  # Strokes baked per checkpoint
+        self.checkpoint_point_budget = 1_000_000  # Bake early when live strokes hold this many points
+        self.checkpoint_seconds = 15 * 60  # Bake a batch when this long has passed since the last checkpoint and half the cap is live
+        self.last_checkpoint = time.monotonic()
+
+        #Autosave - boards are rebuilt from the last snapshot and journal, then every change is journaled off the GUI thread
+        self.journal = None
+        self.recovery = (0, 0.0)  # Events replayed and seconds taken at startup
+        if autosave_dir:
+            self.journal = Journal(autosave_dir)
+            self.recovery = self.journal.recover(self.monitors)
+            self.journal.start(self.monitors if self.recovery[0] else None)
 
         target_geometry = self.detect_screen_geometry(QPoint(50, 50))
         self.set_screen_geometry(target_geometry)
         self.setWindowFlag(Qt.WindowStaysOnTopHint, True)
 
-        self.pixmap = QPixmap(self.size())
-        self.pixmap.fill(Qt.transparent)
-
         self.setFocusPolicy(Qt.NoFocus)
         self.show()
 
+    #Compositor mode - the menu and dock tab become children of the canvas and the background is painted by it
+    #so each update is composited in one window instead of four stacked translucent ones, and nothing needs re-raising
+    #Passthrough then comes from an alpha-0 background (clicks fall through unpainted pixels) rather than a click-through window
+    def enable_compositor(self, menu, tab):
+        self.compositor = True
+        super().disable_passthrough()
+        origin = self.geometry().topLeft()
+        for chrome in (menu, tab):
+            position = chrome.pos()
+            chrome.setParent(self)
+            chrome.move(position - origin)
+            chrome.show()
+        tab.move_to_screen()
+        if hasattr(self, "background_layer"):
+            self.background_layer.hide()
+        if self.is_passthrough:
+            self.enable_passthrough()
+
+    #Keep the menu and dock tab above the ink - as children in compositor mode they already are
+    def raise_chrome(self):
+        with span("raise chrome", "window"):
+            if self.compositor:
+                return
+            self.parent_menu.raise_()
+            self.parent_menu.dock_tab.raise_()
+
     #Gets screen geomtery used for bg color, multiscreen sizes, and drawing area
     def set_screen_geometry(self, geometry):
+        self.frame_clock.flush_now()
         self.setGeometry(geometry)
-        self.pixmap = QPixmap(self.size())
-        self.pixmap.fill(Qt.transparent)
-        self.redraw_all_strokes()
+        self.frame_clock.set_screen(QApplication.screenAt(geometry.center()))
+
+        #Update current screen index - the whole virtual desktop gets its own annotations
+        monitor_index = self.topology.index_of(geometry)
+        if monitor_index >= 0:
+            self.current_screen = monitor_index
+        self.activate_monitor(self.topology.key(monitor_index))
+
+    #Switch to a monitor's annotations - its raster is only rebuilt if it was evicted or made for another size
+    def activate_monitor(self, key):
+        self.monitor_key = key
+        self.monitor = self.monitors.activate(key)
+        self.stroke_store = self.monitor.stroke_store
+        self.history = self.monitor.history
+        self.board = self.monitor.board
+        if self.board.prepare(self.rect()):
+            self.full_redraws += 1
+        self.memory.enforce()
         self.update()
 
+    #What the canvas holds, across every monitor - releases go cheapest to rebuild first:
+    #rasters of boards only kept for undoing a clear, then rasters of monitors not showing
+    def register_memory(self):
+        monitors = lambda: self.monitors.monitors.values()
+        self.memory.register("history", "undo history", lambda: sum(monitor.history.byte_size(monitor.board) for monitor in monitors()),
+                             lambda amount: sum(monitor.history.release_parked(monitor.board) for monitor in monitors()))
+        self.memory.register("vector strokes", "stroke store", lambda: sum(monitor.stroke_store.byte_size() for monitor in monitors()))
+        self.memory.register("ink rasters", "boards", lambda: self.monitors.raster_bytes(),
+                             lambda amount: self.monitors.release(self.monitor, amount))
+        self.memory.register("ui assets", "cursors", self.cursors.byte_size, self.cursors.clear)
+        self.memory.register("ui assets", "asset registry", assets.byte_size)
+
     #Detect screen geometry, used in moving between multiple displays
     def detect_screen_geometry(self, global_pos):
-        for g in self.screen_geometries:
-            if g.contains(global_pos):
-                return g
-        return self.virtual_geometry
+        return self.topology.geometry_at(global_pos)
+
+    #Screens were plugged in, removed, moved or rescaled - only the affected monitors' rasters are dropped
+    #The canvas stays on its monitor while it is connected, otherwise it falls back to the first screen
+    def screens_changed(self, keys):
+        for key in keys:
+            monitor = self.monitors.monitors.get(key)
+            if monitor:
+                monitor.board.evict()
+        if not self.screen_geometries:
+            return
+
+        geometry = self.screen_geometries[max(self.topology.index_of_key(self.monitor_key), 0)]
+        self.set_screen_geometry(geometry)
+        if not hasattr(self, "parent_menu"):
+            return
+        self.sync_layers(geometry)
+
+        #Bring the menu back if its screen went away
+        if self.compositor:
+            if not self.rect().contains(self.parent_menu.pos()):
+                self.parent_menu.move(QPoint(50, 50))
+        elif self.topology.index_at(self.parent_menu.pos()) < 0:
+            self.parent_menu.move(geometry.topLeft() + QPoint(50, 50))
     
     #Custom, color based cursor while drawing
     def set_custom_cursor(self):
-        cursor = create_layered_cursor(resource_path("assetts/arrow_outer.png"), resource_path("assetts/arrow_inner.png"), self.pen_color)
-        self.setCursor(cursor)
+        self.setCursor(self.cursors.layered(self.pen_color, dpr=self.devicePixelRatioF()))
 
-    #Undo Last
+    #Build the cursor of every palette color, for every screen's pixel ratio, while the app is idle
+    def prebuild_cursors(self, colors):
+        self.cursors.prebuild(colors, sorted({screen.devicePixelRatio() for screen in QApplication.screens()}))
+
+    #Undo Last - strokes, erases and clears all go through the history
     def undo_last(self):
-        if self.just_cleared and self.strokes_backup:
-            self.undo_clear()
-        elif self.strokes:
-            self.strokes.pop()
-            self.redraw_all_strokes()
-            self.update()
-    
-    #Undo Clear (only works once)
-    def undo_clear(self):
-        if self.just_cleared and self.strokes_backup:
-            self.strokes = self.strokes_backup.copy()
-            self.redraw_all_strokes()
-            self.update()
-            self.strokes_backup = []
-            self.just_cleared = False
+        self.history.undo(self)
 
-    #Erase all drawings
+    #Redo Last
+    def redo_last(self):
+        self.history.redo(self)
+
+    #Erase all drawings - the old board is kept whole in the history, so this is a swap
     def clear_canvas(self):
-        self.strokes_backup = self.strokes.copy()
-        self.strokes.clear()
-        self.pixmap.fill(Qt.transparent)
-        self.just_cleared = True
-        self.update()
-    
+        command = ClearBoard(self.board, Board())
+        command.redo(self)
+        self.history.push(command)
+
+    #Show a board (used by clear and its undo/redo), rebuilding its raster only if it was made for another area
+    def activate_board(self, board):
+        damage = self.board.tiles.region()
+        self.board = self.monitor.board = board
+        if board.prepare(self.rect()):
+            self.full_redraws += 1
+        self.update(damage.united(board.tiles.region()))
+
+        #A cleared board is one record, a board brought back by undo is snapshotted whole
+        if self.journal:
+            if board.strokes or board.pending or board.baked_tiles.tiles:
+                self.journal.snapshot(self.monitors)
+            else:
+                self.journal_event("clear_board")
+
+    #Save every monitor's board to a session file
+    def save_session(self, path):
+        self.frame_clock.flush_now()
+        save_session(path, self.monitors)
+
+    #Replace every monitor's board with a session file's - strokes are decoded lazily as they are painted
+    #Boards saved on screens this machine doesn't have go to its other screens (see Session.load_into)
+    #Returns the saved screens whose boards found no screen to show them, raises ValueError if the file is not a board
+    def open_session(self, path):
+        self.frame_clock.flush_now()
+        session = Session(path)
+        monitors = MonitorCanvases(self.monitors.budget)
+        unplaced = session.load_into(monitors, self.topology.keys)
+        self.current_stroke = None
+        self.monitors = monitors
+        self.activate_monitor(self.monitor_key)
+        if self.journal:
+            self.journal.snapshot(self.monitors)
+        return unplaced
+
+    #Export this screen's board to PNG (at scale), PDF or SVG on a worker thread - returns the job, see export.py
+    #A solid background is exported under the ink, the transparent one stays transparent
+    def export_board(self, path, scale=1.0):
+        self.frame_clock.flush_now()
+        background = self.background_color if self.background_color.alpha() == 255 else None
+        return export_board(path, self.board, self.size(), scale, background)
+
+    #Clear the board and draw it again the way it was drawn - speed is a multiple of the recorded pace, 0 is as fast as possible
+    #The clear can be undone, which brings the original board straight back
+    #Raises ValueError if the board has baked ink with no strokes behind it, which a replay would clear and never draw back
+    def replay_board(self, speed=1.0):
+        self.frame_clock.flush_now()
+        if self.board.has_pixel_ink():
+            raise ValueError("Part of this board was opened from an older file as a picture, so it can't be replayed")
+        if self.replay:
+            self.replay.stop()
+        strokes = recorded_strokes(self.board)
+        self.clear_canvas()
+        self.replay = Replay(self, strokes)
+        self.replay.finished.connect(self.replay_done)
+        return self.replay.start(speed)
+
+    #The replay is a child of the canvas, holding an event per recorded point until it is deleted
+    def replay_done(self):
+        self.replay.deleteLater()
+        self.replay = None
+
+    #Render frames of this screen's board being drawn into directory on worker threads - returns the Timelapse, see replay.py
+    def export_timelapse(self, directory, fps=30, speed=10.0):
+        self.frame_clock.flush_now()
+        background = self.background_color if self.background_color.alpha() == 255 else None
+        return render_timelapse(self.board, self.size(), directory, fps, speed, background)
+
+    #Show or hide the performance HUD in the top-left corner of the canvas
+    def set_hud_visible(self, visible):
+        if visible and self.hud is None:
+            self.hud = PerformanceHud(self)
+        elif not visible and self.hud is not None:
+            self.hud.deleteLater()
+            self.hud = None
+
+    #Pipeline spans are only recorded between these two - stop_trace writes them as Chrome trace JSON and returns the event count
+    def start_trace(self):
+        tracer.start()
+
+    def stop_trace(self, path):
+        tracer.stop()
+        return tracer.export(path)
+
+    #Record a change to the active board in the autosave journal, compacting it into a new snapshot now and then
+    def journal_event(self, record, *args):
+        if not self.journal:
+            return
+        getattr(self.journal, record)(self.monitor_key, *args)
+        if self.journal.due():
+            self.journal.snapshot(self.monitors)
+
+    #Clean exit - the autosave is only needed after a crash
+    def end_autosave(self):
+        if self.journal:
+            self.journal.discard()
+            self.journal = None
+
+    #Take a stroke off a board (undo of a stroke, or the eraser)
+    def remove_stroke(self, board, stroke):
+        board.remove_stroke(stroke)
+        if board is self.board:
+            self.redraw_region(stroke.bounding_rect())
+            self.journal_event("remove_stroke", stroke)
+
+    #Put a stroke back on a board (redo of a stroke, or undo of an erase)
+    def restore_stroke(self, board, stroke):
+        board.restore_stroke(stroke)
+        if board is self.board:
+            self.redraw_region(stroke.bounding_rect())
+            self.journal_event("add_stroke", stroke)
+
+    #Bake the oldest strokes into the checkpoint layer once the live window is over its limits
+    def maybe_checkpoint(self):
+        live = len(self.board.strokes)
+        if live <= self.checkpoint_interval:
+            return
+
+        over_cap = live - self.live_stroke_cap
+        over_budget = sum(stroke.count for stroke in self.board.strokes) > self.checkpoint_point_budget
+        overdue = live > self.live_stroke_cap // 2 and time.monotonic() - self.last_checkpoint > self.checkpoint_seconds
+        if over_cap > 0 or over_budget or overdue:
+            self.bake_strokes(max(over_cap, self.checkpoint_interval))
+
+    #Move the oldest strokes into the baked raster layer, undo stops at the checkpoint
+    #Their points stay in the stroke store so the eraser can still take them off the baked layer, up to baked_point_budget -
+    #past it (or once the layer is pixel-only anyway) the baked strokes are let go along with any undo that could bring one back
+    def bake_strokes(self, count):
+        baked = self.board.bake_strokes(count)
+        self.history.forget(baked)
+        if not self.board.rebakeable or sum(stroke.count for stroke in self.board.baked) > self.baked_point_budget:
+            self.history.forget_through(self.board.baked_through)
+            for stroke in self.board.flatten_baked():
+                self.stroke_store.release(stroke)
+        self.last_checkpoint = time.monotonic()
+        if self.journal:
+            self.journal.snapshot(self.monitors)
+
     #Show/Hide Drawing Canvas
     def set_canvas_visibility(self, visible: bool):
+        self.show_ink = visible
         if visible:
             #Show Drawing Canvas and Disable Passthrough
             self.show()
+            self.update()
             self.disable_passthrough()
 
             #Update Footer Color Variable and Icon
@@ -169,8 +368,11 @@ class DrawingCanvas(TransparentCanvasWindow):
             if hasattr(self, "parent_menu") and hasattr(self.parent_menu, "footer") and hasattr(self.parent_menu, "eye_off_icon"):
                 self.parent_menu.footer.setIcon(self.parent_menu.eye_off_icon)
         else:
-            #Hide Drawing Canvas and Enable Passthrough
-            self.hide()
+            #Hide Drawing Canvas and Enable Passthrough - in compositor mode the window also holds the menu, so only the ink is hidden
+            if self.compositor:
+                self.update()
+            else:
+                self.hide()
             self.enable_passthrough()
             
             #Update Footer Color Variable and Icon
@@ -188,7 +390,7 @@ class DrawingCanvas(TransparentCanvasWindow):
 
     #Turn Canvas On and Off
     def toggle_canvas_visibility(self):
-        self.set_canvas_visibility(not self.isVisible())
+        self.set_canvas_visibility(not (self.show_ink if self.compositor else self.isVisible()))
         
     #Change drawing/pen width sizes are 5, 10, 15, and 20 pixels
     def set_pen_width(self, width):
@@ -205,27 +407,31 @@ class DrawingCanvas(TransparentCanvasWindow):
          
     #Enable passthrough/click through for OS
     def enable_passthrough(self):
-        super().enable_passthrough()
+        self.set_board_background(QColor(0, 0, 0, 1))
+        if self.compositor:
+            self.set_background_for_monitor(self.current_screen, QColor(0, 0, 0, 0))
+        else:
+            super().enable_passthrough()
         self.is_passthrough = True
         self.unsetCursor()
-        self.set_background_for_monitor(self.current_screen, QColor(0, 0, 0, 1))
         if hasattr(self, 'parent_menu'):
-            self.parent_menu.toggle_btn.setIcon(QIcon(resource_path("assetts/comp_draw.png")))  # Will switch to passthrough
+            self.parent_menu.toggle_btn.setIcon(assets.icon("comp_draw.png"))  # Will switch to passthrough
         if hasattr(self, "parent_menu") and hasattr(self.parent_menu, "selector_manager"):
             self.parent_menu.selector_manager.hide_selectors()
-        if hasattr(self, "background_layer"):
-            self.background_layer.set_background_color(self.current_screen, QColor(0, 0, 0, 1))
 
     #Disable passthrough/click through and go back to drawing or erase mode
     def disable_passthrough(self):
         super().disable_passthrough()
         self.is_passthrough = False
         self.set_custom_cursor()
+        if self.compositor and self.background_color.alpha() == 0:
+            self.set_background_for_monitor(self.current_screen, QColor(0, 0, 0, 1))
 
         if hasattr(self, 'parent_menu'):
-            self.parent_menu.activateWindow()  # Helps with receiving focus immediately
-            self.parent_menu.raise_() #test
-            self.parent_menu.toggle_btn.setIcon(QIcon(resource_path("assetts/comp_control.png"))) 
+            if not self.compositor:
+                self.parent_menu.activateWindow()  # Helps with receiving focus immediately
+                self.parent_menu.raise_() #test
+            self.parent_menu.toggle_btn.setIcon(assets.icon("comp_control.png")) 
 
         if hasattr(self, "parent_menu") and hasattr(self.parent_menu, "selector_manager"):
             self.parent_menu.selector_manager.show_selectors()
@@ -244,10 +450,22 @@ class DrawingCanvas(TransparentCanvasWindow):
         if self.is_passthrough:
             self.disable_passthrough()
             if hasattr(self, 'parent_menu'):
-                self.parent_menu.toggle_btn.setIcon(QIcon(resource_path("assetts/comp_control.png")))
+                self.parent_menu.toggle_btn.setIcon(assets.icon("comp_control.png"))
 
         self.erase_mode = True
-        self.setCursor(create_eraser_cursor(size=24))
+        self.setCursor(self.cursors.eraser(dpr=self.devicePixelRatioF()))
+
+    #Solid boards are painted by the canvas itself as an opaque window and the background layer is hidden
+    #The transparent board keeps the translucent canvas over the background layer
+    #Switching between the two recreates the canvas window on top, so the menu and dock tab are raised back over it
+    def set_board_background(self, color):
+        opaque = color.alpha() == 255
+        if hasattr(self, "background_layer"):
+            self.background_layer.set_background_color(self.current_screen, QColor(0, 0, 0, 1) if opaque else color)
+            self.background_layer.setVisible(not opaque and not self.compositor)
+        self.set_background_for_monitor(self.current_screen, color if opaque or self.compositor else QColor(0, 0, 0, 1))
+        if self.set_opaque(opaque) and hasattr(self, "parent_menu"):
+            self.raise_chrome()
 
     #Turn on background: transparent, white, black, or green
     def set_background_for_monitor(self, monitor_index, color):
@@ -257,15 +475,18 @@ class DrawingCanvas(TransparentCanvasWindow):
             self.background_rect = g
             self.update()
 
+    #Nothing to do if the canvas is already on that screen
     def move_to_screen(self, geometry):
+        if geometry == self.geometry():
+            return
+        menu_position = self.parent_menu.screen_pos()
         self.set_screen_geometry(geometry)
+        if self.compositor:
+            self.parent_menu.move(menu_position - geometry.topLeft())
+        self.sync_layers(geometry)
 
-        # Update current screen index
-        for i, g in enumerate(self.screen_geometries):
-            if g == geometry:
-                self.current_screen = i
-                break
-
+    #Move the background and dock tab to the canvas's screen and restack every layer
+    def sync_layers(self, geometry):
         # Update background position
         if hasattr(self, "background_layer"):
             self.background_layer.set_background_color(self.current_screen, self.background_layer.background_color)
@@ -274,6 +495,9 @@ class DrawingCanvas(TransparentCanvasWindow):
         if hasattr(self.parent_menu, 'dock_tab'):
             self.parent_menu.dock_tab.move_to_screen(geometry)
 
+        if self.compositor:
+            return
+
         #Raise all layers after screen switching
         if hasattr(self.background_layer, 'raise_'):
             self.background_layer.lower()
@@ -286,118 +510,202 @@ class DrawingCanvas(TransparentCanvasWindow):
             self.parent_menu.dock_tab.raise_()
 
 
-    #Redraw line as pixmap to allow for better performance
+    #Redraw lines into the tiled raster to allow for better performance
+    #Strokes are bucketed per tile so each tile is painted once, and only tiles with ink are allocated
+    #Rebuild the whole raster of the current board
     def redraw_all_strokes(self):
-        self.pixmap.fill(Qt.transparent)
-        painter = QPainter(self.pixmap)
-        painter.setRenderHint(QPainter.Antialiasing)
-        for stroke in self.strokes:
-            for segment in stroke.segments:
-                if isinstance(segment, tuple):
-                    pen = QPen(stroke.color, stroke.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
-                    painter.setPen(pen)
-                    painter.drawLine(segment[0], segment[1])
-                else:
-                    pen = QPen(stroke.color, stroke.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
-                    painter.setPen(pen)
-                    painter.drawPath(segment)
-        painter.end()
+        with span("redraw all", "raster"):
+            self.full_redraws += 1
+            self.board.redraw_all(self.rect())
+
+    #Re-rasterize only rect - see Board.redraw_region
+    def redraw_region(self, rect):
+        self.update(self.board.redraw_region(rect))
 
+    #Only the damaged area is refilled and blitted, not the whole screen
+    #Strokes opened from a file are decoded and rasterized the first time their area is painted
     def paintEvent(self, event):
-        painter = self.get_painter(event)
-        painter.drawPixmap(0, 0, self.pixmap)
+        started = time.perf_counter()
+        with span("paint", "paint"):
+            painter = self.get_painter(event)
+            if self.show_ink:
+                for rect in event.region():
+                    changed = self.board.realize(rect)
+                    if not QRegion(changed).subtracted(event.region()).isEmpty():
+                        self.update(changed)
+                    self.board.tiles.blit(painter, rect)
+            painter.end()
+        self.paint_stats.painted(started)
 
     #Click Mouse
     def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton and not self.testAttribute(Qt.WA_TransparentForMouseEvents):
-            if self.background_color.alpha() > 1:
-                self.parent_menu.raise_()
-                self.parent_menu.dock_tab.raise_()
-            if self.erase_mode:
-                self.erase_at(event.position())
-            else:
-                self.just_cleared = False
-                self.current_stroke = Stroke(self.pen_color, self.pen_width)
-                self.current_path = QPainterPath()
-                self.current_path.moveTo(event.position())
-                self.current_stroke.segments.append(self.current_path)
-                self.strokes.append(self.current_stroke)
-                self.points_in_segment = 0
-                self.parent_menu.setWindowOpacity(0.60)
-                self.draw_last_segment()
-
-    #Drag Mouse
-    def mouseMoveEvent(self, event):
-        if event.buttons() & Qt.LeftButton:
-            if self.erase_mode:
-                self.erase_at(event.position())
-            elif self.current_path:
-                self.current_path.lineTo(event.position())
-                self.points_in_segment += 1
-                if self.points_in_segment >= 40:
-                    last_point = self.current_path.currentPosition()
-                    self.draw_last_segment()
-                    self.current_path = QPainterPath()
-                    self.current_path.moveTo(last_point)
-                    self.current_path.lineTo(event.position())
-                    self.current_stroke.segments.append(self.current_path)
-                    self.points_in_segment = 1 
+        self.paint_stats.input_arrived()
+        with span("press", "input"):
+            self.frame_clock.flush_now()
+            if event.button() == Qt.LeftButton and not self.testAttribute(Qt.WA_TransparentForMouseEvents) and not self.is_passthrough:
+                if self.background_color.alpha() > 1:
+                    self.raise_chrome()
+                if self.erase_mode:
+                    self.erase_at(event.position())
                 else:
+                    pos = event.position()
+                    x, y, t = self.input_pipeline.start((pos.x(), pos.y(), event.timestamp()))
+                    self.current_stroke = self.stroke_store.begin_stroke(self.pen_color, self.pen_width, x, y, t)
+                    self.board.add_stroke(self.current_stroke)
+                    self.history.push(AddStroke(self.board, self.current_stroke))
+                    self.parent_menu.setWindowOpacity(0.60)
+                    self.drawn_points = 0
                     self.draw_last_segment()
 
+    #Drag Mouse - samples are buffered until the next frame
+    def mouseMoveEvent(self, event):
+        self.paint_stats.input_arrived()
+        with span("move", "input"):
+            if event.buttons() & Qt.LeftButton:
+                pos = event.position()
+                if self.erase_mode:
+                    self.pending_erase.append(pos)
+                    self.frame_clock.post()
+                elif self.current_stroke:
+                    self.pending_samples.append((pos.x(), pos.y(), event.timestamp()))
+                    self.frame_clock.post()
+
+    #Once per frame - everything buffered since the last frame goes out in one raster pass and one update
+    def flush_input(self):
+        with span("frame", "input"):
+            samples, self.pending_samples = self.pending_samples, []
+            erase, self.pending_erase = self.pending_erase, []
+            tracer.counter("input per frame", samples=len(samples), erase=len(erase))
+            if erase:
+                self.erase_points(erase)
+            if samples and self.current_stroke:
+                self.add_stroke_samples(samples)
+
+    #Feed pointer samples through the input pipeline into the current stroke, then draw what changed
+    #The final (pen-up) sample bypasses the smoothing so the line reaches the release point
+    #Raw input (recorded points, already filtered when they were drawn) skips the pipeline, and its pen-up repeats the last point
+    def add_stroke_samples(self, samples, final=False):
+        stroke = self.current_stroke
+        added = False
+        with span("stroke points", "stroke"):
+            if self.raw_input:
+                filtered = () if final else samples
+            else:
+                filtered = self.input_pipeline.end(samples[-1]) if final else self.input_pipeline.process(samples)
+            for x, y, t in filtered:
+                last_point = QPointF(*stroke.point(stroke.count - 1))
+                self.stroke_store.add_point(stroke, x, y, t)
+                self.board.stroke_index.insert(stroke, pen_damage_rect(QRectF(last_point, QPointF(x, y)).normalized(), stroke.width))
+                added = True
+        if added:
+            self.draw_last_segment()
+
     #Mouse Release - used for single dots, ending lines, and connecting lines
     def mouseReleaseEvent(self, event):
-        #if no movement, draw a point
-        if self.current_stroke and self.current_path and self.points_in_segment == 0:
-            dot_path = QPainterPath()
-            dot_path.addEllipse(event.position(), self.pen_width / 2, self.pen_width / 2)
-            self.current_stroke.segments[-1] = dot_path  # Replace the empty path
-            self.draw_last_segment()
+        self.paint_stats.input_arrived()
+        with span("release", "input"):
+            self.frame_clock.flush_now()
+            if self.current_stroke:
+                pos = event.position()
+                self.add_stroke_samples([(pos.x(), pos.y(), event.timestamp())], final=True)
+
+            #if no movement, draw a point
+            if self.current_stroke and self.current_stroke.count == 1:
+                self.stroke_store.make_dot(self.current_stroke)
+                self.board.stroke_index.insert(self.current_stroke, self.current_stroke.segment_ink_rect(0))
+                self.draw_last_segment()
+            if self.current_stroke:
+                self.finish_stroke(self.current_stroke)
         
-        #Reset Drawing
-        self.current_stroke = None
-        self.current_path = None
-        self.points_in_segment = 0
+            #Reset Drawing
+            self.current_stroke = None
         
-        #Reset Menu
-        self.parent_menu.setWindowOpacity(1.00)  
-        self.parent_menu.raise_()
-        self.parent_menu.dock_tab.raise_()
-
-    #For performance, lines are drawn in 40 point segments, then pushed into pixmap images, this method connects them together
+            #Reset Menu
+            with span("menu opacity", "window"):
+                self.parent_menu.setWindowOpacity(1.00)
+            self.raise_chrome()
+
+    #Simplify the finished stroke and record how many input samples it shed along the way
+    def finish_stroke(self, stroke):
+        with span("finish stroke", "stroke"):
+            stroke.removed_points += self.input_pipeline.dropped
+            if self.simplify_tolerance > 0 and not stroke.dot and not self.raw_input:
+                if self.stroke_store.simplify(stroke, self.simplify_tolerance):
+                    self.board.stroke_index.remove(stroke)
+                    self.board.index_stroke(stroke)
+            self.journal_event("add_stroke", stroke)
+            self.maybe_checkpoint()
+
+    #For performance, only the points added since the last draw are pushed into the tiled raster, joined to the previous point
     def draw_last_segment(self):
-        if not self.current_stroke or not self.current_stroke.segments:
+        stroke = self.current_stroke
+        if not stroke:
             return
-        last = self.current_stroke.segments[-1]
-        painter = QPainter(self.pixmap)
-        painter.setRenderHint(QPainter.Antialiasing)
-        pen = QPen(self.current_stroke.color, self.current_stroke.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
-        painter.setPen(pen)
-        if isinstance(last, tuple):
-            painter.drawLine(last[0], last[1])
+        first = max(self.drawn_points - 1, 0)
+        last = stroke.count - 1
+        self.drawn_points = stroke.count
+
+        if stroke.dot:
+            area = stroke.segment_rect(0)
         else:
-            painter.drawPath(last)
-        painter.end()
-        self.update()
+            xs, ys = zip(*(stroke.point(i) for i in range(first, last + 1)))
+            area = QRectF(min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+        damage = pen_damage_rect(area, stroke.width).intersected(self.rect())
+        pen = QPen(stroke.color, stroke.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+
+        def draw(painter):
+            painter.setPen(pen)
+            if stroke.dot:
+                stroke.draw(painter)
+            else:
+                painter.drawPolyline(stroke.polygon(first, last))
+
+        with span("rasterize segment", "raster"):
+            self.board.tiles.paint(damage, draw)
+        with span("update", "update"):
+            self.update(damage)
 
     #Erases based on a buffer surrounding the pointer
     def erase_at(self, pos):
-
+        self.erase_points([pos])
+
+    #Erase the top-most stroke under each position, then re-rasterize and repaint everything removed at once
+    def erase_points(self, positions):
+        with span("erase", "raster"):
+            #Raise drawings above menu and dim menu
+            if not self.compositor:
+                self.raise_()
+            self.parent_menu.setWindowOpacity(0.60) 
+
+            removed = []
+            for pos in positions:
+                stroke = self.stroke_at(pos)
+                if stroke:
+                    self.board.remove_stroke(stroke)
+                    self.history.push(EraseStroke(self.board, stroke))
+                    self.journal_event("remove_stroke", stroke)
+                    removed.append(stroke)
+
+            damage = QRegion()
+            for stroke in removed:
+                damage = damage.united(self.board.redraw_region(stroke.bounding_rect()))
+            if removed:
+                self.update(damage)
+
+    #Top-most stroke under pos, if any
+    def stroke_at(self, pos):
         erase_buffer = 6  # Size of eraser - may need to revisit
-        
-        #Raise drawings above menu and dim menu
-        self.raise_()
-        self.parent_menu.setWindowOpacity(0.60) 
 
-        for stroke in reversed(self.strokes):
-            for segment in stroke.segments:
-                if isinstance(segment, QPainterPath):
-                    rect = segment.boundingRect().adjusted(-erase_buffer, -erase_buffer, erase_buffer, erase_buffer)
-                    if rect.contains(pos) and segment.contains(pos):
-                        self.strokes.remove(stroke)
-                        self.redraw_all_strokes()
-                        self.update()
-                        return
+        #Only strokes indexed near the pointer are tested, top-most first
+        area = QRectF(pos.x() - erase_buffer, pos.y() - erase_buffer, erase_buffer * 2, erase_buffer * 2)
+        nearby = sorted(self.board.strokes_near(area), key=lambda stroke: stroke.order, reverse=True)
+
+        for stroke in nearby:
+            for segment in range(stroke.segment_count()):
+                rect = stroke.segment_rect(segment).adjusted(-erase_buffer, -erase_buffer, erase_buffer, erase_buffer)
+                if rect.contains(pos) and stroke.segment_path(segment).contains(pos):
+                    return stroke
+        return None
 
 
 
@@ -405,12 +713,40 @@ if __name__ == "__main__":
 
     app = QApplication(sys.argv)
 
+    #--compositor draws the menu, dock tab and background inside the canvas window
+    #--render-backend picks what ink is rasterized into (raster QImage tiles by default)
+    #--no-autosave turns off the crash recovery journal
+    #--memory-budget caps what rasters, strokes, history and UI assets may hold, in MB
+    #--hud shows the performance HUD, --trace records pipeline spans from start to quit and writes them to the given file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--compositor", action="store_true")
+    parser.add_argument("--render-backend", choices=sorted(BACKENDS), default="raster")
+    parser.add_argument("--no-autosave", action="store_true")
+    parser.add_argument("--hud", action="store_true")
+    parser.add_argument("--trace", metavar="TRACE_JSON")
+    parser.add_argument("--memory-budget", type=int, default=MEMORY_BUDGET // (1024 * 1024), metavar="MB")
+    args, _ = parser.parse_known_args()
+
+    #Every image is decoded up front from the asset bundle, see assets.py
+    assets.load()
+
     # Set app icon for taskbar and title bar
-    app.setWindowIcon(QIcon(resource_path("assetts/eddraw_icon.ico")))
+    app.setWindowIcon(assets.icon("eddraw_icon.ico"))
 
     #Set up all needed layers background, drawing canvas, menu, and docking tab
     background = BackgroundLayer()
-    canvas = DrawingCanvas()
+    autosave_dir = None if args.no_autosave else os.path.join(QStandardPaths.writableLocation(QStandardPaths.GenericDataLocation), "EdDraw", "autosave")
+    canvas = DrawingCanvas(args.render_backend, autosave_dir, args.memory_budget * 1024 * 1024)
+    if canvas.render_backend.name != args.render_backend:
+        print(f"{args.render_backend} render backend unavailable, using {canvas.render_backend.name}", file=sys.stderr)
+    if canvas.recovery[0]:
+        print(f"Recovered {canvas.recovery[0]} autosave records in {canvas.recovery[1] * 1000:.0f} ms", file=sys.stderr)
+    app.aboutToQuit.connect(canvas.end_autosave)
+    if args.hud:
+        canvas.set_hud_visible(True)
+    if args.trace:
+        canvas.start_trace()
+        app.aboutToQuit.connect(lambda: canvas.stop_trace(args.trace))
     menu = MenuWindow(canvas)
     tab = DockTab(canvas, menu)
 
@@ -418,7 +754,10 @@ if __name__ == "__main__":
     canvas.background_layer = background
     menu.dock_tab = tab
     
-    background.show()
+    if args.compositor:
+        canvas.enable_compositor(menu, tab)
+    else:
+        background.show()
     canvas.show()
     menu.show()    
     tab.show()
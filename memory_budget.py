@@ -0,0 +1,74 @@
+# memory_budget.py
+#Memory accounting - bytes held per subsystem (ink rasters, vector strokes, history, UI assets) against one overall budget
+#Anything that holds memory registers a measure() callback, caches that can give memory back also register release(amount)
+#When the total goes over the budget, releases run in the order they were registered (cheapest to rebuild first)
+#until the total is back under it - what a release drops is rebuilt on demand, only slower
+
+from PySide6.QtGui import QPixmapCache
+
+SUBSYSTEMS = ("ink rasters", "vector strokes", "history", "ui assets")
+MEMORY_BUDGET = 512 * 1024 * 1024  # Bytes, overall
+
+#Bytes of a decoded pixmap or image
+def pixmap_bytes(pixmap):
+    if pixmap is None or pixmap.isNull():
+        return 0
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+class MemoryBudget:
+    def __init__(self, budget=MEMORY_BUDGET):
+        self.budget = budget
+        self.sources = {}  # Name: (subsystem, measure)
+        self.releases = []  # (name, release) in the order they are tried
+        self.trims = 0  # Times the budget was enforced
+        self.freed = 0  # Bytes given back by enforcing it
+
+    #measure() returns the bytes held now, release(amount) tries to give back at least amount bytes
+    def register(self, subsystem, name, measure, release=None):
+        if subsystem not in SUBSYSTEMS:
+            raise ValueError(f"Unknown memory subsystem {subsystem!r}")
+        self.sources[name] = (subsystem, measure)
+        if release is not None:
+            self.releases.append((name, release))
+
+    def unregister(self, name):
+        self.sources.pop(name, None)
+        self.releases = [(source, release) for source, release in self.releases if source != name]
+
+    #Bytes per source
+    def usage(self):
+        return {name: measure() for name, (subsystem, measure) in self.sources.items()}
+
+    def total(self):
+        return sum(self.usage().values())
+
+    #Give memory back until the total is under the budget - returns the bytes freed
+    def enforce(self):
+        used = self.total()
+        if used <= self.budget:
+            return 0
+        self.trims += 1
+        start = used
+        for name, release in self.releases:
+            release(used - self.budget)
+            used = self.total()
+            if used <= self.budget:
+                break
+        self.freed += max(start - used, 0)
+        return max(start - used, 0)
+
+    #Everything as plain data, for the HUD and benchmark output
+    def stats(self):
+        usage = self.usage()
+        subsystems = {subsystem: {"bytes": 0, "sources": {}} for subsystem in SUBSYSTEMS}
+        for name, size in usage.items():
+            entry = subsystems[self.sources[name][0]]
+            entry["bytes"] += size
+            entry["sources"][name] = size
+        total = sum(usage.values())
+        return {"budget": self.budget, "total": total, "over_budget": total > self.budget,
+                "subsystems": subsystems, "trims": self.trims, "freed": self.freed}
+
+#Qt keeps the pixmaps icons are rendered to in QPixmapCache - clearing it makes them re-render from the decoded sources
+def release_pixmap_cache(amount):
+    QPixmapCache.clear()
@@ -1,21 +1,22 @@
 # menu_ui.py -- v5.10
 #Spacing and visual layout initially generated from AI using picture of previously build app
 
-import sys, os
-from PySide6.QtCore import Qt, QSize
-from PySide6.QtGui import QIcon, QColor, QPixmap, QPainter
-from PySide6.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QLabel, QHBoxLayout, QGridLayout, QApplication, QGraphicsDropShadowEffect)
+import os
+from PySide6.QtCore import Qt, QSize, QTimer, QPoint
+from PySide6.QtGui import QIcon, QColor, QPixmap, QPainter, QAction, QKeySequence
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QLabel, QHBoxLayout, QGridLayout, QApplication, QGraphicsDropShadowEffect,
+                               QFileDialog, QMessageBox, QInputDialog, QProgressDialog)
 from functools import partial
 from selector_manager import SelectorManager
 from hold_button_utils import make_button_holdable
+from export import EXPORT_FILTER
+from memory_budget import pixmap_bytes, release_pixmap_cache
+from assets import assets
 
 COLOR_GREEN = "rgb(34, 180, 115)"
 COLOR_RED = "rgb(230, 76, 60)"
-
-def resource_path(relative_path):
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.join(os.path.abspath("."), relative_path)
+BOARD_FILTER = "EdDraw boards (*.eddraw)"
+TRACE_FILTER = "Chrome trace (*.json)"
 
 def apply_hover_effect(button, radius=6, hover_color="rgba(0,0,0,0.08)"):
     button.setStyleSheet(f"""
@@ -32,9 +33,9 @@ def apply_hover_effect(button, radius=6, hover_color="rgba(0,0,0,0.08)"):
 
 #Hover/Grow Effect For All Icon Buttons
 class HoverGrowButton(QPushButton):
-    def __init__(self, icon_path):
+    def __init__(self, icon):
         super().__init__()
-        self.setIcon(QIcon(icon_path))
+        self.setIcon(icon)
         self.setIconSize(QSize(36, 36))
         self.setFixedSize(44, 44)
         self.setStyleSheet("border: none;")
@@ -51,10 +52,10 @@ class HoverGrowButton(QPushButton):
 
 #Hover Grow For Footer
 class FooterButton(QPushButton):
-    def __init__(self, icon_on_path, icon_off_path, *args, **kwargs):
+    def __init__(self, icon_on, icon_off, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.icon_on = QIcon(icon_on_path)
-        self.icon_off = QIcon(icon_off_path)
+        self.icon_on = icon_on
+        self.icon_off = icon_off
         self.setIcon(self.icon_off)
         self.setIconSize(QSize(32, 32)) 
         self.setFixedHeight(36)
@@ -82,12 +83,12 @@ class MenuWindow(QWidget):
     #Create & Setup tools buttons - draw/passththrough, undo, erase, delete-all
     def create_tool_buttons(self, layout):
         # Create buttons with hover-grow effect
-        self.toggle_btn = HoverGrowButton(resource_path("assetts/comp_draw.png"))
-        undo_btn = HoverGrowButton(resource_path("assetts/undo.png"))
-        erase_btn = HoverGrowButton(resource_path("assetts/eraser.png"))
-        trash_btn = HoverGrowButton(resource_path("assetts/trash_can.png"))
-        self.eye_on_icon = QIcon(resource_path("assetts/eye_on.png"))
-        self.eye_off_icon = QIcon(resource_path("assetts/eye_off.png"))
+        self.toggle_btn = HoverGrowButton(assets.icon("comp_draw.png"))
+        undo_btn = HoverGrowButton(assets.icon("undo.png"))
+        erase_btn = HoverGrowButton(assets.icon("eraser.png"))
+        trash_btn = HoverGrowButton(assets.icon("trash_can.png"))
+        self.eye_on_icon = assets.icon("eye_on.png")
+        self.eye_off_icon = assets.icon("eye_off.png")
 
         # Assign actions
         self.toggle_btn.clicked.connect(self.canvas.toggle_passthrough)
@@ -95,6 +96,56 @@ class MenuWindow(QWidget):
         erase_btn.clicked.connect(self.canvas.enter_erase_mode)
         make_button_holdable(trash_btn, 1000, self.canvas.clear_canvas)
 
+        # Undo/Redo actions - keyboard shortcuts anywhere in the app, and right-click (or press and hold on touch) on undo
+        self.undo_action = QAction("Undo", self)
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.undo_action.setShortcutContext(Qt.ApplicationShortcut)
+        self.undo_action.triggered.connect(self.canvas.undo_last)
+
+        self.redo_action = QAction("Redo", self)
+        self.redo_action.setShortcuts([QKeySequence.Redo, QKeySequence("Ctrl+Y")])
+        self.redo_action.setShortcutContext(Qt.ApplicationShortcut)
+        self.redo_action.triggered.connect(self.canvas.redo_last)
+
+        #Save/Open boards - keyboard shortcuts, or right-click the menu
+        self.save_action = QAction("Save Board...", self)
+        self.save_action.setShortcut(QKeySequence.Save)
+        self.save_action.setShortcutContext(Qt.ApplicationShortcut)
+        self.save_action.triggered.connect(self.save_board)
+
+        self.open_action = QAction("Open Board...", self)
+        self.open_action.setShortcut(QKeySequence.Open)
+        self.open_action.setShortcutContext(Qt.ApplicationShortcut)
+        self.open_action.triggered.connect(self.open_board)
+
+        self.export_action = QAction("Export Board...", self)
+        self.export_action.setShortcut(QKeySequence("Ctrl+E"))
+        self.export_action.setShortcutContext(Qt.ApplicationShortcut)
+        self.export_action.triggered.connect(self.export_board)
+        self.export_job = None
+
+        #Replay the board as it was drawn, or render it as a timelapse
+        self.replay_action = QAction("Replay Board", self)
+        self.replay_action.triggered.connect(self.replay_board)
+        self.timelapse_action = QAction("Export Timelapse...", self)
+        self.timelapse_action.triggered.connect(self.export_timelapse)
+
+        #Performance HUD and pipeline traces, for finding where pen lag comes from
+        self.hud_action = QAction("Performance HUD", self)
+        self.hud_action.setCheckable(True)
+        self.hud_action.setShortcut(QKeySequence("Ctrl+Shift+H"))
+        self.hud_action.setShortcutContext(Qt.ApplicationShortcut)
+        self.hud_action.toggled.connect(self.canvas.set_hud_visible)
+        self.trace_action = QAction("Record Trace", self)
+        self.trace_action.setCheckable(True)
+        self.trace_action.toggled.connect(self.record_trace)
+
+        self.addActions([self.undo_action, self.redo_action, self.save_action, self.open_action, self.export_action,
+                         self.replay_action, self.timelapse_action, self.hud_action, self.trace_action])
+        self.setContextMenuPolicy(Qt.ActionsContextMenu)
+        undo_btn.addActions([self.undo_action, self.redo_action])
+        undo_btn.setContextMenuPolicy(Qt.ActionsContextMenu)
+
         # Add to layout
         tools = [self.toggle_btn, undo_btn, erase_btn, trash_btn]
 
@@ -228,14 +279,14 @@ class MenuWindow(QWidget):
     def create_background_selector(self, layout):
         bg_grid = QGridLayout()
         backgrounds = [
-            (resource_path("assetts/trans_board.png"), QColor(0, 0, 0, 1)),  # transparent
-            (resource_path("assetts/white_board.png"), QColor("white")),
-            (resource_path("assetts/black_board.png"), QColor("black")),
-            (resource_path("assetts/green_board.png"), QColor(81, 144, 106))  # green
+            ("trans_board.png", QColor(0, 0, 0, 1)),  # transparent
+            ("white_board.png", QColor("white")),
+            ("black_board.png", QColor("black")),
+            ("green_board.png", QColor(81, 144, 106))  # green
         ]
 
-        for i, (path, color) in enumerate(backgrounds):
-            btn = HoverGrowButton(path)
+        for i, (name, color) in enumerate(backgrounds):
+            btn = HoverGrowButton(assets.icon(name))
             btn.setIconSize(QSize(36, 36))  # hover logic will bump this to 40
             btn.setCursor(Qt.ArrowCursor)
             btn.setStyleSheet("border: none; background-color: transparent;")
@@ -255,6 +306,14 @@ class MenuWindow(QWidget):
 
         self.drag_position = None
         self.last_monitor_index = -1
+
+        #Screen changes while dragging wait until the drag settles on the new screen
+        self.screen_timer = QTimer(self)
+        self.screen_timer.setSingleShot(True)
+        self.screen_timer.setInterval(150)
+        self.screen_timer.timeout.connect(self.settle_screen)
+        self.drag_start_redraws = 0
+        self.drag_redraws = 0  # Full canvas rebuilds caused by the last drag
         self.last_background_color = None
 
         #Over sized container, allows for drop shadow
@@ -289,7 +348,7 @@ class MenuWindow(QWidget):
 
         #Exit Button
         self.close_btn = QPushButton(self)
-        self.close_btn.setIcon(QIcon(resource_path("assetts/btn_x.png")))
+        self.close_btn.setIcon(assets.icon("btn_x.png"))
         self.close_btn.setIconSize(QSize(18, 18))
         self.close_btn.setFixedSize(28, 28)
         self.close_btn.setStyleSheet("""
@@ -307,7 +366,7 @@ class MenuWindow(QWidget):
 
         #Drop Shadow
         shadow_bg = QLabel(self)
-        shadow_bg.setPixmap(QPixmap(resource_path("assetts/shadow_menu.png")))
+        shadow_bg.setPixmap(assets.pixmap("shadow_menu.png"))
         shadow_bg.setScaledContents(True)
         shadow_bg.setGeometry(0, 0, 160, 596)  # Match full menu size
         shadow_bg.lower()  # Make sure it's behind all other widgets
@@ -321,8 +380,8 @@ class MenuWindow(QWidget):
 
         #Footer Button
         self.footer = FooterButton(
-            resource_path("assetts/eye_on.png"),
-            resource_path("assetts/eye_off.png")
+            assets.icon("eye_on.png"),
+            assets.icon("eye_off.png")
         )
         self.footer.clicked.connect(self.canvas.toggle_canvas_visibility)
 
@@ -340,6 +399,7 @@ class MenuWindow(QWidget):
 
         #Make Color Circles
         self.create_color_buttons(inner_layout)
+        self.canvas.prebuild_cursors([QColor(*rgb) for rgb in self.color_definitions])
 
         #Make Size Selector Butttons
         self.create_size_buttons(inner_layout)
@@ -369,27 +429,151 @@ class MenuWindow(QWidget):
         
         #Raise exit button
         self.close_btn.raise_()
+
+        self.canvas.memory.register("ui assets", "menu icons", self.icon_bytes, release_pixmap_cache)
     #end init
 
+    #Pixmaps the menu shows - button icons at their icon size and the drop shadow image
+    def icon_bytes(self):
+        scale = self.devicePixelRatioF() ** 2
+        size = sum(pixmap_bytes(label.pixmap()) for label in self.findChildren(QLabel))
+        for button in self.findChildren(QPushButton):
+            if not button.icon().isNull():
+                icon = button.icon().actualSize(button.iconSize())
+                size += int(icon.width() * icon.height() * 4 * scale)
+        return size
+
+    def save_board(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Board", "", BOARD_FILTER)
+        if not path:
+            return
+        try:
+            self.canvas.save_session(path)
+        except OSError as error:
+            QMessageBox.warning(self, "Save Board", f"Couldn't save the board:\n{error}")
+
+    def open_board(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Board", "", BOARD_FILTER)
+        if not path:
+            return
+        try:
+            unplaced = self.canvas.open_session(path)
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Open Board", f"Couldn't open the board:\n{error}")
+            return
+        if unplaced:
+            QMessageBox.warning(self, "Open Board", "The board was drawn on more screens than are connected - ink from "
+                                f"{', '.join(unplaced)} is kept in the file but can't be shown until those screens are back")
+
+    def replay_board(self):
+        try:
+            self.canvas.replay_board(1.0)
+        except ValueError as error:
+            QMessageBox.warning(self, "Replay Board", f"Couldn't replay the board:\n{error}")
+
+    #Export runs in the background - the progress dialog doesn't block drawing and its Cancel stops the job
+    def export_board(self):
+        if self.export_job:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Board", "", EXPORT_FILTER)
+        if not path:
+            return
+        scale = 1.0
+        if path.lower().endswith(".png"):
+            scale, accepted = QInputDialog.getDouble(self, "Export Board", "Image scale:", 2.0, 0.25, 4.0, 2)
+            if not accepted:
+                return
+
+        progress = QProgressDialog("Exporting board...", "Cancel", 0, 100, self)
+        progress.setWindowModality(Qt.NonModal)
+        progress.setMinimumDuration(500)
+        job = self.export_job = self.canvas.export_board(path, scale)
+        progress.canceled.connect(job.cancel)
+        job.signals.progress.connect(lambda done, total: progress.setValue(done * 100 // max(total, 1)))
+        job.signals.failed.connect(lambda error: QMessageBox.warning(self, "Export Board", f"Couldn't export the board:\n{error}"))
+        for signal in (job.signals.finished, job.signals.failed, job.signals.cancelled):
+            signal.connect(progress.reset)
+            signal.connect(progress.deleteLater)
+            signal.connect(self.export_done)
+
+    def export_done(self, *args):
+        self.export_job = None
+
+    #Frames go to a folder as frame-00000.png, ... - the job runs in the background like an export
+    def export_timelapse(self):
+        if self.export_job:
+            return
+        directory = QFileDialog.getExistingDirectory(self, "Export Timelapse")
+        if not directory:
+            return
+        speed, accepted = QInputDialog.getDouble(self, "Export Timelapse", "Speed (times real time):", 10.0, 1.0, 500.0, 1)
+        if not accepted:
+            return
+
+        progress = QProgressDialog("Rendering timelapse...", "Cancel", 0, 100, self)
+        progress.setWindowModality(Qt.NonModal)
+        progress.setMinimumDuration(500)
+        job = self.export_job = self.canvas.export_timelapse(directory, speed=speed)
+        progress.canceled.connect(job.cancel)
+        job.progress.connect(lambda done, total: progress.setValue(done * 100 // max(total, 1)))
+        job.failed.connect(lambda error: QMessageBox.warning(self, "Export Timelapse", f"Couldn't render the timelapse:\n{error}"))
+        for signal in (job.finished, job.failed, job.cancelled):
+            signal.connect(progress.reset)
+            signal.connect(progress.deleteLater)
+            signal.connect(self.export_done)
+
+    #Start recording spans, or stop and ask where to save them
+    def record_trace(self, recording):
+        if recording:
+            self.canvas.start_trace()
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Save Trace", "eddraw-trace.json", TRACE_FILTER)
+        if not path:
+            self.canvas.stop_trace(os.devnull)
+            return
+        try:
+            self.canvas.stop_trace(path)
+        except OSError as error:
+            QMessageBox.warning(self, "Save Trace", f"Couldn't save the trace:\n{error}")
+
     def set_background_color(self, color):
 
         self.canvas.set_canvas_visibility(True)
-        self.canvas.background_layer.set_background_color(self.canvas.current_screen, color)
+        self.canvas.set_board_background(color)
 
         if color.alpha() > 1:
             self.canvas.disable_passthrough()
-            self.toggle_btn.setIcon(QIcon(resource_path("assetts/comp_control.png")))
+            self.toggle_btn.setIcon(assets.icon("comp_control.png"))
             self.selector_manager.show_selectors()
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.drag_position = event.globalPosition().toPoint() - self.frameGeometry().topLeft()
+            self.drag_start_redraws = self.canvas.full_redraws
 
+    #Only the menu moves while dragging - the canvas follows once the menu has settled on another screen
     def mouseMoveEvent(self, event):
         if event.buttons() & Qt.LeftButton and self.drag_position:
             self.move(event.globalPosition().toPoint() - self.drag_position)
-            new_geometry = self.canvas.detect_screen_geometry(self.pos())
-            self.canvas.move_to_screen(new_geometry)  # updates current_screen index
+            if self.canvas.detect_screen_geometry(self.screen_pos()) != self.canvas.geometry():
+                self.screen_timer.start()
+            else:
+                self.screen_timer.stop()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton and self.drag_position:
+            self.screen_timer.stop()
+            self.settle_screen()
+            self.drag_position = None
+            self.drag_redraws = self.canvas.full_redraws - self.drag_start_redraws
+
+    #Global position of the menu - in compositor mode it is a child of the canvas, so pos() is canvas-relative
+    def screen_pos(self):
+        return self.mapToGlobal(QPoint(0, 0))
+
+    def settle_screen(self):
+        new_geometry = self.canvas.detect_screen_geometry(self.screen_pos())
+        self.canvas.move_to_screen(new_geometry)  # updates current_screen index
 
 
 
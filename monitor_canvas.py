@@ -0,0 +1,64 @@
+# monitor_canvas.py
+#Annotations belong to the monitor they were drawn on - each one keeps its own stroke store, undo history and board
+#Switching screens swaps an already-rendered monitor in instead of rebuilding the raster
+#Monitors that are not showing give their rasters back under a memory budget, least recently used first:
+#live tiles are dropped (they are rebuilt from the strokes) and, if that is not enough, baked tiles are packed to PNG
+
+from itertools import count
+
+from board import Board
+from history import History
+from stroke_store import StrokeStore
+
+RASTER_BUDGET = 256 * 1024 * 1024  # Bytes of raster kept for monitors that are not showing
+
+class MonitorCanvas:
+    def __init__(self):
+        self.stroke_store = StrokeStore()
+        self.board = Board()
+        self.history = History(self.stroke_store.release)
+        self.last_used = 0
+
+class MonitorCanvases:
+    def __init__(self, budget=RASTER_BUDGET):
+        self.budget = budget
+        self.monitors = {}
+        self.clock = count(1)
+
+    #Monitor for a screen key, created empty the first time it is used
+    def get(self, key):
+        monitor = self.monitors.get(key)
+        if monitor is None:
+            monitor = self.monitors[key] = MonitorCanvas()
+        return monitor
+
+    #Mark a monitor as the one showing, then trim the others back under the budget
+    def activate(self, key):
+        monitor = self.get(key)
+        monitor.last_used = next(self.clock)
+        self.trim(monitor)
+        return monitor
+
+    #Raster bytes held by monitors other than active
+    def inactive_bytes(self, active):
+        return sum(monitor.board.raster_bytes() for monitor in self.monitors.values() if monitor is not active)
+
+    def trim(self, active):
+        over = self.inactive_bytes(active) - self.budget
+        if over > 0:
+            self.release(active, over)
+
+    #Give back at least amount bytes of raster from monitors other than active - returns the bytes freed
+    def release(self, active, amount):
+        inactive = sorted((monitor for monitor in self.monitors.values() if monitor is not active), key=lambda monitor: monitor.last_used)
+        freed = 0
+        for release in (Board.evict, Board.compress):
+            for monitor in inactive:
+                if freed >= amount:
+                    return freed
+                freed += release(monitor.board)
+        return freed
+
+    #Raster bytes of every monitor's board
+    def raster_bytes(self):
+        return sum(monitor.board.raster_bytes() for monitor in self.monitors.values())
@@ -0,0 +1,164 @@
+# render_backend.py
+#Surfaces the canvas rasterizes ink into - tiles are created, painted, copied to the window and packed through a backend
+#raster (default): premultiplied ARGB QImage tiles painted by Qt's software engine, safe to paint from any thread
+#pixmap: QPixmap tiles, the original path - native pixmaps that can only be painted on the GUI thread
+#opengl: each tile is a framebuffer object painted on an offscreen GL context, read back once per change to be copied to the window
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage, QPainter, QPixmap
+
+class RasterBackend:
+    name = "raster"
+
+    def new_surface(self, size):
+        surface = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+        surface.fill(Qt.transparent)
+        return surface
+
+    def begin(self, surface):
+        return QPainter(surface)
+
+    def end(self, painter, surface):
+        painter.end()
+
+    #Copy source_rect of a surface onto a widget painter at target_rect
+    def draw(self, painter, target_rect, surface, source_rect):
+        painter.drawImage(target_rect, surface, source_rect)
+
+    def byte_size(self, surface):
+        return surface.sizeInBytes()
+
+    def save(self, surface, device):
+        surface.save(device, "PNG")
+
+    #A QImage of the surface that other threads can read
+    def image(self, surface):
+        return QImage(surface)
+
+    def load(self, data):
+        return QImage.fromData(data, "PNG").convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+class PixmapBackend(RasterBackend):
+    name = "pixmap"
+
+    def new_surface(self, size):
+        surface = QPixmap(size, size)
+        surface.fill(Qt.transparent)
+        return surface
+
+    def draw(self, painter, target_rect, surface, source_rect):
+        painter.drawPixmap(target_rect, surface, source_rect)
+
+    def byte_size(self, surface):
+        return surface.width() * surface.height() * surface.depth() // 8
+
+    def image(self, surface):
+        return surface.toImage()
+
+    def load(self, data):
+        surface = QPixmap()
+        surface.loadFromData(data, "PNG")
+        return surface
+
+#A framebuffer object and the image last read back from it
+class GLTile:
+    __slots__ = ("fbo", "device", "image")
+
+    def __init__(self, fbo):
+        self.fbo = fbo
+        self.device = None
+        self.image = None
+
+class OpenGLBackend(RasterBackend):
+    name = "opengl"
+
+    def __init__(self):
+        from PySide6.QtGui import QOffscreenSurface, QOpenGLContext
+        from PySide6.QtOpenGL import QOpenGLFramebufferObject, QOpenGLFramebufferObjectFormat, QOpenGLPaintDevice
+        self.framebuffer = QOpenGLFramebufferObject
+        self.paint_device = QOpenGLPaintDevice
+
+        self.context = QOpenGLContext()
+        if not self.context.create():
+            raise RuntimeError("no OpenGL context available")
+        self.surface = QOffscreenSurface()
+        self.surface.setFormat(self.context.format())
+        self.surface.create()
+        if not self.context.makeCurrent(self.surface):
+            raise RuntimeError("OpenGL context can't be made current")
+
+        #Multisampled so lines are antialiased like the raster engines
+        self.format = QOpenGLFramebufferObjectFormat()
+        self.format.setAttachment(QOpenGLFramebufferObject.CombinedDepthStencil)
+        self.format.setSamples(4)
+
+    def new_surface(self, size):
+        self.context.makeCurrent(self.surface)
+        tile = GLTile(self.framebuffer(size, size, self.format))
+        painter = self.begin(tile)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.fillRect(0, 0, size, size, Qt.transparent)
+        self.end(painter, tile)
+        return tile
+
+    def begin(self, surface):
+        self.context.makeCurrent(self.surface)
+        surface.fbo.bind()
+        surface.device = self.paint_device(surface.fbo.size())
+        return QPainter(surface.device)
+
+    def end(self, painter, surface):
+        painter.end()
+        surface.fbo.release()
+        surface.device = None
+        surface.image = None
+
+    def image(self, surface):
+        if surface.image is None:
+            self.context.makeCurrent(self.surface)
+            surface.image = surface.fbo.toImage()
+        return surface.image
+
+    def draw(self, painter, target_rect, surface, source_rect):
+        painter.drawImage(target_rect, self.image(surface), source_rect)
+
+    #Texture memory plus the read-back copy
+    def byte_size(self, surface):
+        size = surface.fbo.size()
+        cached = surface.image.sizeInBytes() if surface.image is not None else 0
+        return size.width() * size.height() * 4 + cached
+
+    def save(self, surface, device):
+        self.image(surface).save(device, "PNG")
+
+    def load(self, data):
+        image = QImage.fromData(data, "PNG")
+        tile = self.new_surface(image.width())
+        painter = self.begin(tile)
+        painter.drawImage(0, 0, image)
+        self.end(painter, tile)
+        return tile
+
+BACKENDS = {
+    "raster": RasterBackend,
+    "pixmap": PixmapBackend,
+    "opengl": OpenGLBackend,
+}
+
+_backend = None
+
+#Backend new tile stores use - raster unless use_backend() picked another
+def default_backend():
+    global _backend
+    if _backend is None:
+        _backend = RasterBackend()
+    return _backend
+
+#Pick the backend by name, falling back to raster if it can't start (no GL driver, for one)
+def use_backend(name):
+    global _backend
+    try:
+        _backend = BACKENDS[name]()
+    except (KeyError, RuntimeError, ImportError):
+        _backend = RasterBackend()
+    return _backend
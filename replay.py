@@ -0,0 +1,289 @@
+# replay.py
+#Replaying how a board was drawn, from the point times recorded with every stroke
+#Replay re-drives the canvas with synthetic mouse events, in real time, sped up, or as fast as possible
+#(the last doubles as a repeatable load for the drawing path), and Timelapse renders frames of the board being drawn on worker threads
+#
+#Both work from a lesson timeline: strokes in drawing order, each point at its ms since the lesson began
+#Pauses between strokes are capped, and strokes without recorded times (drawn before timing existed) get a steady pace
+#Baked checkpoint strokes are on the timeline like any other, except where the baked tiles only kept their pixels (see Board.has_pixel_ink) -
+#a timelapse then starts from those tiles, and a replay refuses rather than clear ink it can't draw back
+
+import os
+import threading
+import time
+from bisect import bisect_right
+from itertools import accumulate
+
+from PySide6.QtCore import QElapsedTimer, QEvent, QObject, QPointF, QRunnable, QThreadPool, QTimer, Qt, Signal
+from PySide6.QtGui import QColor, QImage, QMouseEvent, QPainter, QPen, QPolygonF
+
+from export import ExportSignals
+from session_file import MONITOR_PIXEL_BAKED, capture_board
+
+MAX_PAUSE = 3000  # Longest pause kept between two strokes, ms
+UNTIMED_PAUSE = 400  # Pause before a stroke without recorded times, ms
+UNTIMED_POINT = 8  # Time between points of a stroke without recorded times, ms
+
+PRESS, MOVE, RELEASE = range(3)
+MOUSE_EVENTS = {PRESS: QEvent.MouseButtonPress, MOVE: QEvent.MouseMove, RELEASE: QEvent.MouseButtonRelease}
+
+#A board's strokes as (color, width, dot, points, times) on one lesson timeline, in drawing order
+def recorded_strokes(board):
+    return lesson_timeline(capture_board(board)[0])
+
+#Captured strokes (see session_file.capture_board) on one lesson timeline
+def lesson_timeline(captured):
+    strokes = []
+    clock = 0
+    recorded_end = None
+    for color, width, dot, baked, order, point_count, bounds, coords, started, deltas in sorted(captured, key=lambda stroke: stroke[4]):
+        points = [(coords[i], coords[i + 1]) for i in range(0, len(coords), 2)]
+        if started:
+            offsets = list(accumulate(deltas))
+            pause = min(max(started - recorded_end, 0), MAX_PAUSE) if recorded_end is not None else 0
+            recorded_end = started + offsets[-1]
+        else:
+            offsets = [i * UNTIMED_POINT for i in range(point_count)]
+            pause = UNTIMED_PAUSE if strokes else 0
+            recorded_end = None
+        begin = clock + pause
+        times = [begin + offset for offset in offsets]
+        clock = times[-1]
+        strokes.append((color, width, dot, points, times))
+    return strokes
+
+#Draws recorded strokes back onto a canvas through its mouse handlers, so they go through the same raster path as a pen
+#Recorded points were filtered and simplified when they were drawn, so by default they skip the canvas's input pipeline (see raw_input)
+#raw_input=False feeds them through it like live pen samples, which is what the canvas benchmark measures
+class Replay(QObject):
+    progress = Signal(int, int)  # Strokes replayed, total
+    finished = Signal()
+
+    def __init__(self, canvas, strokes, raw_input=True):
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.strokes = strokes
+        self.raw_input = raw_input
+        self.events = []
+        for index, (color, width, dot, points, times) in enumerate(strokes):
+            self.events.append((times[0], PRESS, *points[0], index))
+            for (x, y), t in zip(points[1:], times[1:]):
+                self.events.append((t, MOVE, x, y, index))
+            self.events.append((times[-1], RELEASE, *points[-1], index))
+        self.next_event = 0
+        self.speed = 1.0
+        self.base_timestamp = 0
+        self.clock = QElapsedTimer()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+
+    #Replay at speed times the recorded pace - 0 (or less) replays as fast as possible before returning
+    def start(self, speed=1.0):
+        self.speed = speed
+        self.next_event = 0
+        self.pen = self.canvas.pen_color, self.canvas.pen_width
+        self.canvas.erase_mode = False
+        self.canvas.raw_input = self.raw_input
+        if self.canvas.is_passthrough:
+            self.canvas.disable_passthrough()
+        self.base_timestamp = round(time.monotonic() * 1000)
+        if speed <= 0:
+            return self.run_fast()
+        self.clock.start()
+        self.tick()
+
+    #Stop a timed replay, lifting the pen if a stroke was in progress
+    def stop(self):
+        if not self.timer.isActive():
+            return
+        self.timer.stop()
+        for event in self.events[self.next_event:]:
+            if event[1] == PRESS:
+                break
+            if event[1] == RELEASE:
+                self.dispatch(event)
+                break
+        self.done()
+
+    #Every event due by now, then sleep until the next one
+    def tick(self):
+        now = self.clock.elapsed() * self.speed
+        while self.next_event < len(self.events) and self.events[self.next_event][0] <= now:
+            self.dispatch(self.events[self.next_event])
+            self.next_event += 1
+        if self.next_event >= len(self.events):
+            self.done()
+            return
+        self.timer.start(max(0, round((self.events[self.next_event][0] - now) / self.speed)))
+
+    #All events back to back - moves are flushed whenever the recorded time crosses a frame, as the frame clock would
+    #Returns (events, seconds taken)
+    def run_fast(self):
+        started = time.perf_counter()
+        frame = 1000 / self.canvas.frame_clock.refresh_rate
+        last_frame = 0
+        for event in self.events:
+            self.dispatch(event)
+            if event[1] == MOVE and event[0] - last_frame >= frame:
+                self.canvas.frame_clock.tick()
+                last_frame = event[0]
+        self.next_event = len(self.events)
+        self.done()
+        return len(self.events), time.perf_counter() - started
+
+    def dispatch(self, event):
+        t, kind, x, y, index = event
+        if kind == PRESS:
+            color, width = self.strokes[index][0:2]
+            self.canvas.pen_color = QColor.fromRgba(color)
+            self.canvas.pen_width = width
+            self.progress.emit(index, len(self.strokes))
+        position = QPointF(x, y)
+        button = Qt.NoButton if kind == MOVE else Qt.LeftButton
+        buttons = Qt.NoButton if kind == RELEASE else Qt.LeftButton
+        mouse = QMouseEvent(MOUSE_EVENTS[kind], position, self.canvas.mapToGlobal(position), button, buttons, Qt.NoModifier)
+        mouse.setTimestamp(self.base_timestamp + round(t))
+        if kind == PRESS:
+            self.canvas.mousePressEvent(mouse)
+        elif kind == MOVE:
+            self.canvas.mouseMoveEvent(mouse)
+        else:
+            self.canvas.mouseReleaseEvent(mouse)
+
+    def done(self):
+        self.canvas.pen_color, self.canvas.pen_width = self.pen
+        self.canvas.raw_input = False
+        self.progress.emit(len(self.strokes), len(self.strokes))
+        self.finished.emit()
+
+#Renders a run of timelapse frames - each worker paints its frames incrementally into its own image, starting from the baked tiles
+class TimelapseJob(QRunnable):
+    def __init__(self, strokes, tiles, tile_size, size, frames, directory, background, signals, stop):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.strokes = strokes
+        self.tiles = tiles
+        self.tile_size = tile_size
+        self.size = size
+        self.frames = frames  # (frame number, lesson time) pairs
+        self.directory = directory
+        self.background = background
+        self.signals = signals
+        self.stop = stop
+
+    def run(self):
+        image = QImage(self.size, QImage.Format_ARGB32_Premultiplied)
+        image.fill(self.background if self.background is not None else Qt.transparent)
+        if self.tiles:
+            painter = QPainter(image)
+            for (column, row), tile in self.tiles:
+                painter.drawImage(column * self.tile_size, row * self.tile_size, tile)
+            painter.end()
+        drawn = [0] * len(self.strokes)  # Points of each stroke already painted
+        first_open = 0
+        for number, moment in self.frames:
+            if self.stop.is_set():
+                self.signals.cancelled.emit()
+                return
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.Antialiasing)
+            for index in range(first_open, len(self.strokes)):
+                color, width, dot, points, times = self.strokes[index]
+                if times[0] > moment:
+                    break
+                reached = bisect_right(times, moment)
+                if reached <= drawn[index]:
+                    continue
+                painter.setPen(QPen(QColor.fromRgba(color), width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+                if dot:
+                    painter.drawEllipse(QPointF(*points[0]), width / 2, width / 2)
+                else:
+                    painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in points[max(drawn[index] - 1, 0):reached]]))
+                drawn[index] = reached
+            painter.end()
+            while first_open < len(self.strokes) and drawn[first_open] == len(self.strokes[first_open][3]):
+                first_open += 1
+
+            path = os.path.join(self.directory, f"frame-{number:05d}.png")
+            if not image.save(path, "PNG"):
+                self.signals.failed.emit(f"Couldn't write {path}")
+                return
+            self.signals.progress.emit(number, len(self.frames))
+        self.signals.finished.emit(self.directory)
+
+#A timelapse split over the workers of a thread pool - progress counts frames written by all of them
+class Timelapse(QObject):
+    progress = Signal(int, int)  # Frames written, total
+    finished = Signal(str)  # Folder written
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, strokes, size, directory, fps=30, speed=10.0, background=None, pool=None, tiles=(), tile_size=0):
+        super().__init__()
+        self.pool = pool or QThreadPool.globalInstance()
+        self.stop = threading.Event()
+        self.written = 0
+        self.ended = 0
+        self.outcome = None
+
+        #Each frame advances speed * 1/fps seconds of the lesson, the last one shows the finished board
+        duration = max((stroke[4][-1] for stroke in strokes), default=0)
+        step = 1000 * speed / fps
+        self.total = int(duration // step) + 2
+        moments = [(number, min(number * step, duration)) for number in range(self.total)]
+
+        workers = max(1, min(self.pool.maxThreadCount(), self.total))
+        share = -(-self.total // workers)
+        self.jobs = []
+        for first in range(0, self.total, share):
+            job = TimelapseJob(strokes, tiles, tile_size, size, moments[first:first + share], directory, background, ExportSignals(), self.stop)
+            job.signals.progress.connect(self.frame_written)
+            job.signals.finished.connect(self.job_ended)
+            job.signals.failed.connect(self.job_failed)
+            job.signals.cancelled.connect(self.job_cancelled)
+            self.jobs.append(job)
+
+    def start(self):
+        for job in self.jobs:
+            self.pool.start(job)
+        return self
+
+    def cancel(self):
+        self.stop.set()
+
+    def frame_written(self, number, total):
+        self.written += 1
+        self.progress.emit(self.written, self.total)
+
+    def job_ended(self, directory):
+        self.ended += 1
+        if self.ended == len(self.jobs):
+            if self.outcome is None:
+                self.finished.emit(directory)
+            elif self.outcome == "cancelled":
+                self.cancelled.emit()
+            else:
+                self.failed.emit(self.outcome)
+
+    def job_failed(self, error):
+        self.outcome = error
+        self.stop.set()
+        self.job_ended(None)
+
+    def job_cancelled(self):
+        if self.outcome is None:
+            self.outcome = "cancelled"
+        self.job_ended(None)
+
+#Render a timelapse of board into directory (frame-00000.png, ...) on worker threads
+#Baked tiles that only kept their pixels are the first frame's background, and the strokes already in them aren't drawn again
+def render_timelapse(board, size, directory, fps=30, speed=10.0, background=None, pool=None):
+    os.makedirs(directory, exist_ok=True)
+    strokes, tiles, tile_size, flags = capture_board(board)
+    if flags & MONITOR_PIXEL_BAKED and tiles:
+        strokes = [stroke for stroke in strokes if not stroke[3]]
+    else:
+        tiles = []
+    return Timelapse(lesson_timeline(strokes), size, directory, fps, speed, background, pool, tiles, tile_size).start()
@@ -0,0 +1,103 @@
+# screen_topology.py
+#One shared model of the connected screens, kept current as screens are plugged in, removed, moved or rescaled
+#Windows read screen geometry from here instead of a snapshot taken at startup
+
+from functools import partial
+
+from PySide6.QtCore import QObject, QRect, QRectF, Signal
+from PySide6.QtWidgets import QApplication
+
+from spatial_index import SpatialGrid
+
+VIRTUAL_KEY = "virtual"  # Key for the whole virtual desktop, used when no single screen matches
+
+class ScreenTopology(QObject):
+    #Emitted after the model is rebuilt, with the keys of the screens that were added, removed or changed
+    changed = Signal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.screens = []
+        self.geometries = []
+        self.keys = []
+        self.virtual_geometry = QRect()
+        self.lookup = SpatialGrid(cell_size=512)  # Screen indices by area, so point lookups don't scan every screen
+
+        app = QApplication.instance()
+        app.screenAdded.connect(self.screen_added)
+        app.screenRemoved.connect(self.screen_removed)
+        for screen in QApplication.screens():
+            self.watch(screen)
+        self.rebuild(QApplication.screens())
+
+    def watch(self, screen):
+        screen.geometryChanged.connect(partial(self.screen_changed, screen))
+        screen.logicalDotsPerInchChanged.connect(partial(self.screen_changed, screen))
+
+    #Stable name for a screen - monitors keep their annotations by this key, so it must survive other screens coming and going
+    @staticmethod
+    def screen_key(screen, index):
+        return screen.name() or f"screen{index}"
+
+    def rebuild(self, screens):
+        self.screens = list(screens)
+        self.geometries = [screen.geometry() for screen in self.screens]
+        self.keys = [self.screen_key(screen, i) for i, screen in enumerate(self.screens)]
+
+        self.virtual_geometry = QRect()
+        self.lookup.clear()
+        for i, g in enumerate(self.geometries):
+            self.virtual_geometry = self.virtual_geometry.united(g)
+            self.lookup.insert(i, QRectF(g))
+
+    def screen_added(self, screen):
+        self.watch(screen)
+        self.rebuild(QApplication.screens())
+        self.changed.emit([self.keys[self.screens.index(screen)]])
+
+    def screen_removed(self, screen):
+        if screen not in self.screens:
+            return
+        key = self.keys[self.screens.index(screen)]
+        self.rebuild(s for s in QApplication.screens() if s is not screen)
+        self.changed.emit([key])
+
+    #Geometry or DPI of one screen changed
+    def screen_changed(self, screen, *args):
+        if screen not in self.screens:
+            return
+        self.rebuild(QApplication.screens())
+        self.changed.emit([self.keys[self.screens.index(screen)]])
+
+    #Index of the screen containing point, -1 if it is on none of them
+    def index_at(self, point):
+        area = QRectF(point.x(), point.y(), 0, 0)
+        for i in sorted(self.lookup.query(area)):
+            if self.geometries[i].contains(point):
+                return i
+        return -1
+
+    #Geometry of the screen containing point, or the whole virtual desktop
+    def geometry_at(self, point):
+        index = self.index_at(point)
+        return self.geometries[index] if index >= 0 else self.virtual_geometry
+
+    #Index of the screen with exactly this geometry, -1 if none
+    def index_of(self, geometry):
+        index = self.index_at(geometry.center())
+        return index if index >= 0 and self.geometries[index] == geometry else -1
+
+    def key(self, index):
+        return self.keys[index] if 0 <= index < len(self.keys) else VIRTUAL_KEY
+
+    def index_of_key(self, key):
+        return self.keys.index(key) if key in self.keys else -1
+
+_topology = None
+
+#The shared topology, created on first use (needs a QApplication)
+def screen_topology():
+    global _topology
+    if _topology is None:
+        _topology = ScreenTopology()
+    return _topology
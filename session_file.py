@@ -0,0 +1,395 @@
+# session_file.py
+#Saving and opening boards - every monitor's strokes and baked checkpoint tiles in one versioned binary file
+#
+#Layout (little-endian):
+#  header     magic, version, reserved
+#  strokes    per stroke: point coordinates in 1/16 px, first point then deltas, zigzag varints
+#             then, for timed strokes, the start time and each point's ms since the previous point, varints
+#  tiles      per baked tile: PNG bytes
+#  directory  palette (ARGB), monitors (key, stroke count, tile count, tile size, flags), stroke entries, tile entries
+#  trailer    directory offset, magic
+#Version 2 added each stroke's order to its entry, so a snapshot and the autosave journal agree on stroke ids
+#Version 3 also saves the baked checkpoint strokes (flagged, they are already in the tiles) so they can still be erased,
+#and monitor flags - boards whose baked tiles came from an older file and hold ink with no strokes behind it are marked
+#
+#Opening only reads the directory - the file stays memory-mapped and a board's strokes are decoded
+#when the area they cover is first painted (see PendingStrokes and Board.realize)
+#Saving is split in two: capture_session copies what is needed on the GUI thread, write_session can run on any thread
+
+import mmap
+import os
+import struct
+from itertools import accumulate, count
+
+from PySide6.QtCore import QByteArray, QBuffer, QIODevice, QRectF
+from PySide6.QtGui import QColor
+
+from screen_topology import VIRTUAL_KEY
+from spatial_index import SpatialGrid
+from stroke_store import Stroke, pen_damage_rect
+
+MAGIC = b"EDRW"
+VERSION = 3
+SCALE = 16  # Coordinates are stored in 1/16 px
+MAX_COORDINATE = 32768  # Largest stroke box coordinate or pen width an opened file may hold, px
+
+HEADER = struct.Struct("<4sHH")
+TRAILER = struct.Struct("<Q4s")
+COUNT = struct.Struct("<I")
+COLOR = struct.Struct("<I")
+MONITOR = struct.Struct("<IIHH")  # Stroke count, tile count, tile size, flags
+V2_MONITOR = struct.Struct("<IIH")  # Same without the flags
+STROKE_ENTRY = struct.Struct("<QIIHBfQ4f")  # Offset, byte length, points, color index, flags, width, order, left, top, right, bottom
+V1_STROKE_ENTRY = struct.Struct("<QIIHBf4f")  # Same without the order
+TILE_ENTRY = struct.Struct("<QIii")  # Offset, byte length, column, row
+
+FLAG_DOT = 1
+FLAG_TIMED = 2  # Point times follow the points - strokes saved before timing existed don't have them
+FLAG_BAKED = 4  # Part of the baked checkpoint layer - drawn from the tiles, only indexed for the eraser
+
+MONITOR_PIXEL_BAKED = 1  # Some baked ink is only pixels, so the baked tiles can't be re-baked from strokes
+
+def write_varint(out, value):
+    value = (value << 1) ^ (value >> 63)  # Zigzag, small negative deltas stay small
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varints(data, total):
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append((value >> 1) ^ -(value & 1))
+        value = shift = 0
+        if len(values) == total:
+            break
+    return values
+
+#Delta + varint encoding of flat x, y coordinates, followed by the point times when deltas (ms between points) are given
+def encode_points(coords, started=0, deltas=None):
+    out = bytearray()
+    px = py = 0
+    for i in range(0, len(coords), 2):
+        x, y = round(coords[i] * SCALE), round(coords[i + 1] * SCALE)
+        write_varint(out, x - px)
+        write_varint(out, y - py)
+        px, py = x, y
+    if deltas is not None:
+        write_varint(out, started)
+        for delta in deltas:
+            write_varint(out, delta)
+    return out
+
+#Points, start time and each point's ms since the start (None for untimed strokes)
+#Raises ValueError if data runs out before every value is read
+def decode_points(data, point_count, timed=False):
+    total = point_count * 3 + 1 if timed else point_count * 2
+    values = read_varints(data, total)
+    if len(values) < total:
+        raise ValueError("stroke data is cut short")
+    points = []
+    x = y = 0
+    for i in range(0, point_count * 2, 2):
+        x += values[i]
+        y += values[i + 1]
+        points.append((x / SCALE, y / SCALE))
+    if not timed:
+        return points, 0, None
+    return points, values[point_count * 2], list(accumulate(values[point_count * 2 + 1:]))
+
+#Save every monitor's current board
+def save_session(path, monitors):
+    write_session(path, capture_session(monitors))
+
+#Copy everything a save needs out of the boards, as (key, strokes, pending strokes, baked tiles, tile size, monitor flags)
+#Coordinates are copied as arrays and baked tiles as QImages, which can be read from another thread
+#Nothing is decoded - strokes still pending from an opened file are copied as their encoded bytes and packed tiles as their PNG bytes,
+#so saving and autosave snapshots of a long opened session stay a copy
+def capture_session(monitors):
+    captured = []
+    for key, monitor in monitors.monitors.items():
+        board = monitor.board
+        pending = board.pending.encoded() if board.pending else []
+        captured.append((key, capture_strokes(board), pending, capture_tiles(board), board.baked_tiles.tile_size, monitor_flags(board)))
+    return captured
+
+#One board as (strokes, baked tiles, tile size, monitor flags), every stroke decoded - what exports and replays are rendered from
+def capture_board(board):
+    board.realize_all()
+    if board.baked_tiles.packed:
+        board.baked_tiles.expand()
+    return capture_strokes(board), capture_tiles(board), board.baked_tiles.tile_size, monitor_flags(board)
+
+#Decoded strokes, baked then live, each flagged with whether the baked tiles already hold it
+def capture_strokes(board):
+    strokes = []
+    for stroke in board.all_strokes():
+        start = stroke.offset * 2
+        coords = stroke.store.coords[start:start + stroke.count * 2]
+        deltas = stroke.store.times[stroke.offset:stroke.offset + stroke.count]
+        strokes.append((stroke.color.rgba(), stroke.width, stroke.dot, stroke.order <= board.baked_through, stroke.order, stroke.count,
+                        tuple(stroke.bounds[0:4]), coords, stroke.started, deltas))
+    return strokes
+
+#Baked tiles as QImages, or as PNG bytes while the layer is packed
+def capture_tiles(board):
+    if board.baked_tiles.packed:
+        return [(tile_key, QByteArray(data)) for tile_key, data in board.baked_tiles.packed.items()]
+    backend = board.baked_tiles.backend
+    return [(tile_key, backend.image(tile)) for tile_key, tile in board.baked_tiles.tiles.items()]
+
+def monitor_flags(board):
+    return 0 if board.rebakeable else MONITOR_PIXEL_BAKED
+
+#Encode a capture to path - written beside the target, flushed to disk and swapped in, so a failed save never leaves half a board
+def write_session(path, captured):
+    palette = {}
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, 0))
+        stroke_entries = []
+        tile_entries = []
+        for key, strokes, pending, tiles, tile_size, monitor_flags in captured:
+            for color, width, dot, baked, order, point_count, bounds, coords, started, deltas in strokes:
+                color_index = palette.setdefault(color, len(palette))
+                data = encode_points(coords, started, deltas)
+                flags = FLAG_TIMED | (FLAG_DOT if dot else 0) | (FLAG_BAKED if baked else 0)
+                stroke_entries.append(STROKE_ENTRY.pack(out.tell(), len(data), point_count, color_index, flags, width, order, *bounds))
+                out.write(data)
+            for color, flags, width, order, point_count, bounds, data in pending:
+                color_index = palette.setdefault(color, len(palette))
+                stroke_entries.append(STROKE_ENTRY.pack(out.tell(), len(data), point_count, color_index, flags, width, order, *bounds))
+                out.write(data)
+
+            for (column, row), image in tiles:
+                data = image
+                if not isinstance(image, QByteArray):
+                    data = QByteArray()
+                    buffer = QBuffer(data)
+                    buffer.open(QIODevice.WriteOnly)
+                    image.save(buffer, "PNG")
+                tile_entries.append(TILE_ENTRY.pack(out.tell(), data.size(), column, row))
+                out.write(data.data())
+
+        directory = out.tell()
+        out.write(COUNT.pack(len(palette)))
+        for color in palette:
+            out.write(COLOR.pack(color))
+        out.write(COUNT.pack(len(captured)))
+        for key, strokes, pending, tiles, tile_size, monitor_flags in captured:
+            name = str(key).encode("utf-8")
+            out.write(COUNT.pack(len(name)) + name)
+            out.write(MONITOR.pack(len(strokes) + len(pending), len(tiles), tile_size, monitor_flags))
+        out.writelines(stroke_entries)
+        out.writelines(tile_entries)
+        out.write(TRAILER.pack(directory, MAGIC))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(temp_path, path)
+
+#Saved strokes of one board that have not been decoded yet, found by area
+class PendingStrokes:
+    def __init__(self, session, entries, store):
+        self.session = session
+        self.entries = entries
+        self.store = store
+        self.grid = SpatialGrid(cell_size=256)
+        for i, entry in enumerate(entries):
+            width = entry[5]
+            left, top, right, bottom = entry[7:11]
+            self.grid.insert(i, pen_damage_rect(QRectF(left, top, right - left, bottom - top), width))
+
+    #Decode and return (stroke, baked) for the strokes whose cells touch rect
+    def take(self, rect):
+        return self.decode(self.grid.query(rect))
+
+    def take_all(self):
+        return self.decode(list(self.grid.item_cells))
+
+    #Strokes not decoded yet as (color, flags, width, order, points, box, encoded data), copied out of the map to be saved again as they are
+    def encoded(self):
+        data = self.session.data
+        strokes = []
+        for i in self.grid.item_cells:
+            offset, length, point_count, color_index, flags, width, order, *bounds = self.entries[i]
+            strokes.append((self.session.palette[color_index].rgba(), flags, width, order, point_count, tuple(bounds),
+                            bytes(data[offset:offset + length])))
+        return strokes
+
+    #A stroke whose data doesn't decode, or decodes to points outside its saved box, is dropped
+    #This runs while painting, where an exception would leave the painter open
+    def decode(self, indices):
+        strokes = []
+        for i in sorted(indices):
+            offset, length, point_count, color_index, flags, width, order, left, top, right, bottom = self.entries[i]
+            self.grid.remove(i)
+            try:
+                points, started, times = decode_points(self.session.data[offset:offset + length], point_count, bool(flags & FLAG_TIMED))
+            except ValueError:
+                continue
+            if not all(left - 1 <= x <= right + 1 and top - 1 <= y <= bottom + 1 for x, y in points):
+                continue
+            stroke = self.store.load_stroke(self.session.palette[color_index], width, points,
+                                            dot=bool(flags & FLAG_DOT), order=order, started=started, times=times)
+            strokes.append((stroke, bool(flags & FLAG_BAKED)))
+        if not self.grid:
+            self.session.release()
+        return strokes
+
+    def __len__(self):
+        return len(self.grid)
+
+#An opened session file - the directory is parsed up front, the stroke data stays in the memory map
+class Session:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} is empty")
+        self.users = 0
+        self.version = VERSION
+        self.read_directory(path)
+
+    #Any problem with the file raises ValueError and closes it
+    def read_directory(self, path):
+        data = self.data
+        if len(data) < HEADER.size + TRAILER.size:
+            self.close()
+            raise ValueError(f"{path} is not an EdDraw board")
+        magic, version, _ = HEADER.unpack_from(data, 0)
+        directory, end_magic = TRAILER.unpack_from(data, len(data) - TRAILER.size)
+        if magic != MAGIC or end_magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an EdDraw board")
+        if version > VERSION:
+            self.close()
+            raise ValueError(f"{path} was saved by a newer version of EdDraw")
+        self.version = version
+        try:
+            self.read_entries(directory)
+        except (ValueError, struct.error, UnicodeDecodeError) as error:
+            self.close()
+            raise ValueError(f"{path} is damaged: {error}") from None
+
+    #Palette, monitors and entries - every entry is checked against the file, so data read later can't lie outside it
+    def read_entries(self, directory):
+        data = self.data
+        end = len(data) - TRAILER.size
+        if not HEADER.size <= directory <= end:
+            raise ValueError("directory offset is outside the file")
+
+        offset = directory
+        (palette_size,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        self.palette = []
+        for _ in range(palette_size):
+            self.palette.append(QColor.fromRgba(COLOR.unpack_from(data, offset)[0]))
+            offset += COLOR.size
+
+        (monitor_count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        self.monitors = []
+        monitor = MONITOR if self.version >= 3 else V2_MONITOR
+        for _ in range(monitor_count):
+            (name_length,) = COUNT.unpack_from(data, offset)
+            offset += COUNT.size
+            key = bytes(data[offset:offset + name_length]).decode("utf-8")
+            offset += name_length
+            stroke_count, tile_count, tile_size, *flags = monitor.unpack_from(data, offset)
+            offset += monitor.size
+            if tile_size == 0:
+                raise ValueError("tile size is 0")
+            #Before version 3 baked ink was never saved as strokes
+            flags = flags[0] if flags else MONITOR_PIXEL_BAKED
+            self.monitors.append([key, stroke_count, tile_count, tile_size, flags])
+
+        entry = STROKE_ENTRY if self.version >= 2 else V1_STROKE_ENTRY
+        first = 0
+        for monitor in self.monitors:
+            entries = [entry.unpack_from(data, offset + i * entry.size) for i in range(monitor[1])]
+            if self.version < 2:
+                entries = [values[:6] + (first + i,) + values[6:] for i, values in enumerate(entries)]
+                first += len(entries)
+            offset += monitor[1] * entry.size
+            monitor[1] = entries
+        for monitor in self.monitors:
+            entries = [TILE_ENTRY.unpack_from(data, offset + i * TILE_ENTRY.size) for i in range(monitor[2])]
+            offset += monitor[2] * TILE_ENTRY.size
+            monitor[2] = entries
+        if offset > end:
+            raise ValueError("directory runs into the trailer")
+
+        #Stroke and tile data lie between the header and the directory
+        #Boxes and widths are bounded too, they decide how many index cells a pending stroke fills
+        for key, strokes, tiles, tile_size, flags in self.monitors:
+            for entry in strokes:
+                offset, length, point_count, color_index = entry[0:4]
+                width, order, left, top, right, bottom = entry[5:11]
+                if not HEADER.size <= offset <= offset + length <= directory:
+                    raise ValueError("stroke data is outside the file")
+                if point_count == 0 or color_index >= len(self.palette):
+                    raise ValueError("stroke entry is invalid")
+                if not (0 <= width <= MAX_COORDINATE and all(abs(value) <= MAX_COORDINATE for value in (left, top, right, bottom))
+                        and left <= right and top <= bottom):
+                    raise ValueError("stroke box is out of range")
+            for offset, length, column, row in tiles:
+                if not HEADER.size <= offset <= offset + length <= directory:
+                    raise ValueError("tile data is outside the file")
+
+    #Fill each monitor's board - baked tiles go in still packed, strokes stay pending until painted
+    #Boards are keyed by screen name - given the current screens' keys, boards saved under names this machine doesn't have
+    #(a lesson prepared on other screens) move to the current screens no saved board is using, in order
+    #Returns the saved keys that found no screen, their boards are loaded under the saved key
+    def load_into(self, monitors, screen_keys=None):
+        claim_orders(max((entry[6] for monitor in self.monitors for entry in monitor[1]), default=-1))
+        keys = {}
+        unplaced = []
+        if screen_keys is not None:
+            saved = {monitor[0] for monitor in self.monitors}
+            free = [key for key in screen_keys if key not in saved]
+            for monitor in self.monitors:
+                key = monitor[0]
+                if key in screen_keys or key == VIRTUAL_KEY:
+                    continue
+                if free:
+                    keys[key] = free.pop(0)
+                else:
+                    unplaced.append(key)
+        for key, stroke_entries, tile_entries, tile_size, flags in self.monitors:
+            monitor = monitors.get(keys.get(key, key))
+            board = monitor.board
+            board.baked_through = max((entry[6] for entry in stroke_entries if entry[4] & FLAG_BAKED), default=-1)
+            board.rebakeable = not (flags & MONITOR_PIXEL_BAKED and tile_entries)
+            board.baked_tiles.tile_size = tile_size
+            for offset, length, column, row in tile_entries:
+                board.baked_tiles.packed[(column, row)] = QByteArray(bytes(self.data[offset:offset + length]))
+            if stroke_entries:
+                self.users += 1
+                board.pending = PendingStrokes(self, stroke_entries, monitor.stroke_store)
+        if not self.users:
+            self.close()
+        return unplaced
+
+    #A board has decoded all its strokes, the map is closed once none are left
+    def release(self):
+        self.users -= 1
+        if self.users <= 0:
+            self.close()
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+#Saved strokes keep the order they were saved with, so new strokes must be numbered above the highest one
+def claim_orders(highest):
+    following = next(Stroke._order)
+    Stroke._order = count(max(following, highest + 1))
@@ -0,0 +1,55 @@
+# spatial_index.py
+#Uniform grid over stroke bounding boxes (padded for the pen, see Stroke.segment_ink_rect), used so eraser hit-tests
+#and region redraws only look at strokes near the pointer or the region
+
+import math
+
+CELL_SIZE = 128
+
+class SpatialGrid:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.item_cells = {}
+
+    #Keys (column, row) of every cell touching a QRect/QRectF
+    def cell_keys(self, rect):
+        size = self.cell_size
+        left = math.floor(rect.left() / size)
+        right = math.floor(rect.right() / size)
+        top = math.floor(rect.top() / size)
+        bottom = math.floor(rect.bottom() / size)
+        for row in range(top, bottom + 1):
+            for column in range(left, right + 1):
+                yield (column, row)
+
+    #Add an item to every cell under rect, can be called again as the item grows
+    def insert(self, item, rect):
+        keys = self.item_cells.setdefault(item, set())
+        for key in self.cell_keys(rect):
+            if key not in keys:
+                keys.add(key)
+                self.cells.setdefault(key, set()).add(item)
+
+    def remove(self, item):
+        for key in self.item_cells.pop(item, ()):
+            cell = self.cells[key]
+            cell.discard(item)
+            if not cell:
+                del self.cells[key]
+
+    #Items whose cells touch rect - candidates only, callers still do the exact test
+    def query(self, rect):
+        found = set()
+        for key in self.cell_keys(rect):
+            cell = self.cells.get(key)
+            if cell:
+                found.update(cell)
+        return found
+
+    def clear(self):
+        self.cells.clear()
+        self.item_cells.clear()
+
+    def __len__(self):
+        return len(self.item_cells)
@@ -0,0 +1,145 @@
+# stroke_filters.py
+#Streaming pipeline between pointer input and the stroke store
+#Each stage is a callable that takes an iterable of (x, y, t) samples and yields the ones it keeps, so stages chain like generators
+#t is the event timestamp in milliseconds
+
+import math
+
+#Drop samples that barely moved from the last kept one
+class Dedupe:
+    def __init__(self, min_distance=0.5):
+        self.min_distance = min_distance
+        self.reset()
+
+    def reset(self):
+        self.last = None
+
+    def __call__(self, samples):
+        for x, y, t in samples:
+            if self.last is not None and math.hypot(x - self.last[0], y - self.last[1]) < self.min_distance:
+                continue
+            self.last = (x, y)
+            yield x, y, t
+
+#One Euro filter (Casiez et al.) - strong smoothing when the pen is slow, little lag when it moves fast
+#Cutoffs are in Hz, beta is how quickly the cutoff rises with speed (in pixels per second)
+class OneEuroFilter:
+    def __init__(self, min_cutoff=4.0, beta=0.05, derivative_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+        self.reset()
+
+    def reset(self):
+        self.previous = None
+
+    @staticmethod
+    def alpha(cutoff, elapsed):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / elapsed)
+
+    def __call__(self, samples):
+        for x, y, t in samples:
+            if self.previous is None:
+                self.previous = (x, y, t, 0.0, 0.0)
+                yield x, y, t
+                continue
+
+            px, py, pt, pdx, pdy = self.previous
+            elapsed = max(t - pt, 1) / 1000.0
+
+            a = self.alpha(self.derivative_cutoff, elapsed)
+            dx = pdx + a * ((x - px) / elapsed - pdx)
+            dy = pdy + a * ((y - py) / elapsed - pdy)
+
+            a = self.alpha(self.min_cutoff + self.beta * math.hypot(dx, dy), elapsed)
+            x = px + a * (x - px)
+            y = py + a * (y - py)
+
+            self.previous = (x, y, t, dx, dy)
+            yield x, y, t
+
+class StrokePipeline:
+    def __init__(self, stages=None, end_distance=0.5):
+        self.stages = stages if stages is not None else [Dedupe(), OneEuroFilter()]
+        self.end_distance = end_distance
+        self.begin()
+
+    #Reset every stage for a new stroke
+    def begin(self):
+        self.received = 0
+        self.emitted = 0
+        self.last = None
+        for stage in self.stages:
+            stage.reset()
+
+    #The pen-down sample always starts the stroke, like end() it doesn't depend on what the stages keep
+    #It still runs through the stages so they filter the samples that follow against it
+    def start(self, sample):
+        self.begin()
+        for _ in self.process([sample]):
+            pass
+        self.emitted = self.received
+        self.last = sample
+        return sample
+
+    #Run a batch of samples through every stage
+    def process(self, samples):
+        samples = list(samples)
+        self.received += len(samples)
+        for stage in self.stages:
+            samples = stage(samples)
+        for sample in samples:
+            self.emitted += 1
+            self.last = sample
+            yield sample
+
+    #The pen-up sample skips the filters so the stroke ends where the pen lifted, not where smoothing lagged to
+    def end(self, sample):
+        self.received += 1
+        x, y, t = sample
+        if self.last is not None and math.hypot(x - self.last[0], y - self.last[1]) >= self.end_distance:
+            self.emitted += 1
+            self.last = sample
+            yield sample
+
+    #Samples the live stages have dropped so far
+    @property
+    def dropped(self):
+        return self.received - self.emitted
+
+#Ramer-Douglas-Peucker - indices of the points to keep so no dropped point is further than tolerance from the result
+def simplify_indices(points, tolerance):
+    count = len(points)
+    if count < 3:
+        return list(range(count))
+
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    limit = tolerance * tolerance
+    pending = [(0, count - 1)]
+
+    while pending:
+        first, last = pending.pop()
+        ax, ay = points[first]
+        bx, by = points[last]
+        dx, dy = bx - ax, by - ay
+        length = dx * dx + dy * dy
+
+        farthest, distance = -1, limit
+        for i in range(first + 1, last):
+            px, py = points[i]
+            if length == 0:
+                d = (px - ax) ** 2 + (py - ay) ** 2
+            else:
+                cross = (px - ax) * dy - (py - ay) * dx
+                d = cross * cross / length
+            if d > distance:
+                farthest, distance = i, d
+
+        if farthest >= 0:
+            keep[farthest] = True
+            pending.append((first, farthest))
+            pending.append((farthest, last))
+
+    return [i for i in range(count) if keep[i]]
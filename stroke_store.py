@@ -0,0 +1,266 @@
+# stroke_store.py
+#Compact, array backed storage for strokes
+#Every stroke's points live in one shared float buffer and each stroke only keeps offsets into it
+#Colors are kept once in a palette, QPainterPath/QPolygonF objects are only built when needed for rendering or hit-testing
+#Point times are kept the same way, as 16-bit millisecond deltas in a second buffer (see Stroke.timeline)
+
+import sys
+from array import array
+from itertools import accumulate, count
+
+from PySide6.QtCore import Qt, QPointF, QRectF
+from PySide6.QtGui import QColor, QPainterPath, QPen, QPolygonF
+
+from stroke_filters import simplify_indices
+
+#Points per segment - segments are the unit for live drawing and eraser hit-tests
+SEGMENT_POINTS = 40
+
+#Compact once this many dead coordinates pile up (and they outnumber live ones)
+COMPACT_THRESHOLD = 65536
+
+MAX_TIME_DELTA = 65535  # Longest pause between two points a time delta can hold, in ms
+
+#Pad a bounding box by the pen so the damaged area covers caps and antialiasing
+def pen_damage_rect(rect: QRectF, width):
+    margin = width / 2 + 2
+    return rect.adjusted(-margin, -margin, margin, margin).toAlignedRect()
+
+class Stroke:
+    #Creation order, used to paint in order and hit the top-most stroke first when erasing
+    _order = count()
+
+    #bounds holds left, top, right, bottom for the whole stroke, then the same 4 values per segment
+    #removed_points counts input samples dropped by filtering and simplification
+    #started is the first point's event timestamp and elapsed the time from it to the last point, both in ms
+    __slots__ = ("store", "offset", "count", "color_index", "width", "dot", "order", "bounds", "removed_points", "started", "elapsed")
+
+    def __init__(self, store, offset, color_index, width):
+        self.store = store
+        self.offset = offset
+        self.count = 0
+        self.color_index = color_index
+        self.width = width
+        self.dot = False
+        self.order = next(Stroke._order)
+        self.bounds = array('f')
+        self.removed_points = 0
+        self.started = 0
+        self.elapsed = 0
+
+    #Pen batching key - strokes sharing it can be drawn without a setPen in between
+    @property
+    def pen_key(self):
+        return self.color_index, self.width
+
+    @property
+    def color(self) -> QColor:
+        return self.store.palette[self.color_index]
+
+    #(x, y) of point i
+    def point(self, i):
+        coords = self.store.coords
+        base = (self.offset + i) * 2
+        return coords[base], coords[base + 1]
+
+    #Milliseconds from the first point to each point
+    def timeline(self):
+        return list(accumulate(self.store.times[self.offset:self.offset + self.count]))
+
+    def segment_count(self):
+        return len(self.bounds) // 4 - 1
+
+    #First and last point index (inclusive) of a segment, neighbouring segments share an end point
+    def segment_range(self, segment):
+        start = segment * SEGMENT_POINTS
+        return start, min(start + SEGMENT_POINTS, self.count - 1)
+
+    def segment_rect(self, segment):
+        left, top, right, bottom = self.bounds[4 + segment * 4:8 + segment * 4]
+        return QRectF(left, top, right - left, bottom - top)
+
+    #One segment's box padded for the pen - what the spatial indexes hold, so a region query finds every stroke whose ink reaches it
+    def segment_ink_rect(self, segment):
+        return pen_damage_rect(self.segment_rect(segment), self.width)
+
+    #Area of the canvas covered by this stroke, padded for the pen
+    def bounding_rect(self):
+        left, top, right, bottom = self.bounds[0:4]
+        return pen_damage_rect(QRectF(left, top, right - left, bottom - top), self.width)
+
+    #Points first..last (inclusive) as a polygon, built on demand
+    def polygon(self, first=0, last=None):
+        if last is None:
+            last = self.count - 1
+        coords = self.store.coords
+        base = self.offset * 2
+        return QPolygonF([QPointF(coords[base + i * 2], coords[base + i * 2 + 1]) for i in range(first, last + 1)])
+
+    #Shape of a segment for hit-testing, built on demand
+    def segment_path(self, segment):
+        path = QPainterPath()
+        if self.dot:
+            path.addEllipse(QPointF(*self.point(0)), self.width / 2, self.width / 2)
+        else:
+            path.addPolygon(self.polygon(*self.segment_range(segment)))
+        return path
+
+    #Paint the stroke with the pen already set on the painter
+    #Polygons are built per segment from the point buffer and not kept - caching them measured no faster and cost 16 B/point
+    def draw(self, painter):
+        if self.dot:
+            painter.drawEllipse(QPointF(*self.point(0)), self.width / 2, self.width / 2)
+            return
+        for segment in range(self.segment_count()):
+            painter.drawPolyline(self.polygon(*self.segment_range(segment)))
+
+#Paint strokes in order, only changing pen when the (color, width) of the next stroke differs
+#Strokes are not regrouped across different pens so overlapping ink keeps its stacking order
+#Pen runs are all the batching there is - rasterizing the pens dominates a redraw (see benchmarks/bench_redraw.py)
+def render_strokes(painter, strokes):
+    pen_key = None
+    for stroke in strokes:
+        if stroke.pen_key != pen_key:
+            pen_key = stroke.pen_key
+            painter.setPen(QPen(stroke.color, stroke.width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+        stroke.draw(painter)
+
+class StrokeStore:
+    def __init__(self):
+        self.coords = array('f')
+        self.times = array('H')  # Per point, ms since the stroke's previous point
+        self.palette = []
+        self.palette_lookup = {}
+        self.live = {}
+        self.dead_coords = 0
+
+    #Palette index for a color, adding it the first time it is seen
+    def color_index(self, color: QColor):
+        key = color.rgba()
+        index = self.palette_lookup.get(key)
+        if index is None:
+            index = len(self.palette)
+            self.palette.append(QColor(color))
+            self.palette_lookup[key] = index
+        return index
+
+    #t is the event timestamp in ms, strokes built without one are untimed (every delta 0)
+    def begin_stroke(self, color: QColor, width, x, y, t=0):
+        stroke = Stroke(self, len(self.coords) // 2, self.color_index(color), width)
+        stroke.started = round(t)
+        self.live[stroke.order] = stroke
+        self.add_point(stroke, x, y, t)
+        return stroke
+
+    #Rebuild a finished stroke from saved points, at the depth (order) it was saved at
+    #times, if saved, are each point's ms since started
+    def load_stroke(self, color: QColor, width, points, dot=False, order=None, started=0, times=None):
+        times = times or [0] * len(points)
+        stroke = self.begin_stroke(color, width, *points[0], started)
+        for (x, y), time in zip(points[1:], times[1:]):
+            self.add_point(stroke, x, y, started + time)
+        if dot:
+            self.make_dot(stroke)
+        if order is not None:
+            del self.live[stroke.order]
+            stroke.order = order
+            self.live[order] = stroke
+        return stroke
+
+    #Append a point to the stroke being drawn, keeping the cached segment boxes current
+    def add_point(self, stroke, x, y, t=None):
+        #Only the newest stroke can grow in place, anything else is moved to the end first
+        if stroke.offset + stroke.count != len(self.coords) // 2:
+            self.relocate(stroke)
+
+        delta = 0
+        if t is not None and stroke.count:
+            delta = min(max(round(t - stroke.started - stroke.elapsed), 0), MAX_TIME_DELTA)
+            stroke.elapsed += delta
+        self.coords.append(x)
+        self.coords.append(y)
+        self.times.append(delta)
+        stroke.count += 1
+
+        bounds = stroke.bounds
+        if stroke.count == 1:
+            bounds.extend((x, y, x, y, x, y, x, y))
+            return
+
+        #A new segment starts at the last point of the previous one
+        if (stroke.count - 2) % SEGMENT_POINTS == 0 and stroke.count > 2:
+            px, py = stroke.point(stroke.count - 2)
+            bounds.extend((px, py, px, py))
+
+        for base in (0, len(bounds) - 4):
+            bounds[base] = min(bounds[base], x)
+            bounds[base + 1] = min(bounds[base + 1], y)
+            bounds[base + 2] = max(bounds[base + 2], x)
+            bounds[base + 3] = max(bounds[base + 3], y)
+
+    #Rewrite a stroke with only the points Ramer-Douglas-Peucker keeps, returns how many were removed
+    def simplify(self, stroke, tolerance):
+        points = [stroke.point(i) for i in range(stroke.count)]
+        kept = simplify_indices(points, tolerance)
+        removed = len(points) - len(kept)
+        if removed == 0 or stroke.dot:
+            return 0
+
+        if stroke.offset + stroke.count != len(self.coords) // 2:
+            self.relocate(stroke)
+        times = stroke.timeline()
+        del self.coords[stroke.offset * 2:]
+        del self.times[stroke.offset:]
+        stroke.count = 0
+        stroke.elapsed = 0
+        stroke.bounds = array('f')
+        for i in kept:
+            self.add_point(stroke, *points[i], stroke.started + times[i])
+
+        stroke.removed_points += removed
+        return removed
+
+    #Turn a single-point stroke into a round dot
+    def make_dot(self, stroke):
+        stroke.dot = True
+        x, y = stroke.point(0)
+        radius = stroke.width / 2
+        stroke.bounds = array('f', (x - radius, y - radius, x + radius, y + radius) * 2)
+
+    def relocate(self, stroke):
+        start = stroke.offset * 2
+        points = self.coords[start:start + stroke.count * 2]
+        times = self.times[stroke.offset:stroke.offset + stroke.count]
+        stroke.offset = len(self.coords) // 2
+        self.coords.extend(points)
+        self.times.extend(times)
+        self.dead_coords += len(points)
+
+    #Give a stroke's storage back once nothing (canvas, undo) can reach it any more
+    def release(self, stroke):
+        if self.live.pop(stroke.order, None) is None:
+            return
+        self.dead_coords += stroke.count * 2
+        if self.dead_coords > COMPACT_THRESHOLD and self.dead_coords > len(self.coords) - self.dead_coords:
+            self.compact()
+
+    #Rebuild the shared buffer with only live strokes, in buffer order so the newest stroke stays last
+    def compact(self):
+        coords = array('f')
+        times = array('H')
+        for stroke in sorted(self.live.values(), key=lambda stroke: stroke.offset):
+            start = stroke.offset * 2
+            times.extend(self.times[stroke.offset:stroke.offset + stroke.count])
+            stroke.offset = len(coords) // 2
+            coords.extend(self.coords[start:start + stroke.count * 2])
+        self.coords = coords
+        self.times = times
+        self.dead_coords = 0
+
+    def point_count(self):
+        return sum(stroke.count for stroke in self.live.values())
+
+    #Bytes held: coordinate and time buffers, per-stroke records and their cached boxes
+    def byte_size(self):
+        records = sum(sys.getsizeof(stroke) + sys.getsizeof(stroke.bounds) for stroke in self.live.values())
+        return sys.getsizeof(self.coords) + sys.getsizeof(self.times) + records
@@ -0,0 +1,118 @@
+# tile_store.py
+#Sparse tiled raster used as the drawing canvas backing store
+#Tiles are only allocated where there is ink, so memory follows the inked area instead of the screen size
+#What a tile is (QImage, QPixmap, framebuffer) is up to the render backend
+
+from PySide6.QtCore import Qt, QRect, QByteArray, QBuffer, QIODevice
+from PySide6.QtGui import QPainter, QRegion
+
+from render_backend import default_backend
+
+TILE_SIZE = 256
+
+class TileStore:
+    def __init__(self, tile_size=TILE_SIZE, backend=None):
+        self.tile_size = tile_size
+        self.backend = backend or default_backend()
+        self.tiles = {}
+        self.packed = {}  # PNG bytes of tiles while the store is compressed
+
+    #Keys (column, row) of every tile touching rect
+    def tile_keys(self, rect):
+        if rect.isEmpty():
+            return
+        size = self.tile_size
+        for row in range(rect.top() // size, rect.bottom() // size + 1):
+            for column in range(rect.left() // size, rect.right() // size + 1):
+                yield (column, row)
+
+    #Area a tile covers in canvas coordinates
+    def tile_rect(self, key):
+        size = self.tile_size
+        return QRect(key[0] * size, key[1] * size, size, size)
+
+    #Drop every tile
+    def clear(self):
+        self.tiles.clear()
+        self.packed.clear()
+
+    #Run draw(painter) once on a tile, allocating it on first ink
+    #The painter is translated so draw() works in canvas coordinates
+    def paint_tile(self, key, draw):
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.backend.new_surface(self.tile_size)
+            self.tiles[key] = tile
+
+        painter = self.backend.begin(tile)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.translate(-key[0] * self.tile_size, -key[1] * self.tile_size)
+        draw(painter)
+        self.backend.end(painter, tile)
+
+    #Run draw(painter) on every tile touching rect
+    def paint(self, rect, draw):
+        for key in self.tile_keys(rect):
+            self.paint_tile(key, draw)
+
+    #True if any tile touching rect has been allocated
+    def has_tiles(self, rect):
+        return any(key in self.tiles for key in self.tile_keys(rect))
+
+    #Clear rect and repaint it with draw(painter), clipped to rect
+    #Tiles that has_ink(tile_rect) reports as empty are freed instead of repainted
+    def repaint(self, rect, draw, has_ink):
+        for key in list(self.tile_keys(rect)):
+            tile_rect = self.tile_rect(key)
+            if not has_ink(tile_rect):
+                self.tiles.pop(key, None)
+                continue
+
+            part = rect.intersected(tile_rect)
+
+            def clipped(painter, part=part):
+                painter.setCompositionMode(QPainter.CompositionMode_Source)
+                painter.fillRect(part, Qt.transparent)
+                painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+                painter.setClipRect(part)
+                draw(painter)
+
+            self.paint_tile(key, clipped)
+
+    #Copy the inked tiles inside rect onto a widget painter
+    def blit(self, painter, rect):
+        for key in self.tile_keys(rect):
+            tile = self.tiles.get(key)
+            if tile is None:
+                continue
+            tile_rect = self.tile_rect(key)
+            part = rect.intersected(tile_rect)
+            self.backend.draw(painter, part, tile, part.translated(-tile_rect.topLeft()))
+
+    #Area covered by allocated tiles
+    def region(self):
+        region = QRegion()
+        for key in self.tiles:
+            region = region.united(self.tile_rect(key))
+        return region
+
+    #Pack every tile into PNG bytes - for layers that can't be rebuilt while nothing is showing them
+    def compress(self):
+        for key, tile in self.tiles.items():
+            data = QByteArray()
+            buffer = QBuffer(data)
+            buffer.open(QIODevice.WriteOnly)
+            self.backend.save(tile, buffer)
+            self.packed[key] = data
+        self.tiles.clear()
+
+    #Decode packed tiles back into pixmaps before the store is drawn or painted again
+    def expand(self):
+        for key, data in self.packed.items():
+            self.tiles[key] = self.backend.load(data)
+        self.packed.clear()
+
+    #Raster memory currently allocated, in bytes
+    def byte_size(self):
+        pixels = sum(self.backend.byte_size(tile) for tile in self.tiles.values())
+        return pixels + sum(data.size() for data in self.packed.values())
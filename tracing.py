@@ -0,0 +1,92 @@
+# tracing.py
+#Timing spans through the drawing pipeline - input, stroke building, rasterizing, update scheduling, painting, window raises
+#Spans are recorded only while tracing is on, otherwise span() hands back one shared do-nothing context
+#Recorded spans export as Chrome trace-event JSON (open in chrome://tracing or https://ui.perfetto.dev)
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    __slots__ = ("tracer", "name", "category", "start")
+
+    def __init__(self, tracer, name, category):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.category, self.start, time.perf_counter_ns() - self.start)
+        return False
+
+class Tracer:
+    def __init__(self, capacity=500_000):
+        self.enabled = False
+        self.events = deque(maxlen=capacity)  # Oldest spans are dropped once full
+        self.origin = time.perf_counter_ns()
+
+    def start(self):
+        self.events.clear()
+        self.origin = time.perf_counter_ns()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    #Context manager timing a stage - category groups stages (input, stroke, raster, paint, window)
+    def span(self, name, category="canvas"):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, category)
+
+    #A point in time, like a frame being presented
+    def instant(self, name, category="canvas"):
+        if self.enabled:
+            self.events.append(("i", name, category, time.perf_counter_ns(), 0, threading.get_ident(), None))
+
+    #Values plotted as a track, like points per frame
+    def counter(self, name, **values):
+        if self.enabled:
+            self.events.append(("C", name, "counter", time.perf_counter_ns(), 0, threading.get_ident(), values))
+
+    def record(self, name, category, start, duration):
+        self.events.append(("X", name, category, start, duration, threading.get_ident(), None))
+
+    #Chrome trace-event JSON, times in microseconds from when tracing started
+    def export(self, path):
+        pid = os.getpid()
+        trace = []
+        for phase, name, category, start, duration, thread, values in list(self.events):
+            event = {"name": name, "cat": category, "ph": phase, "ts": (start - self.origin) / 1000, "pid": pid, "tid": thread}
+            if phase == "X":
+                event["dur"] = duration / 1000
+            elif phase == "i":
+                event["s"] = "t"
+            else:
+                event["args"] = values
+            trace.append(event)
+        with open(path, "w") as out:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, out)
+        return len(trace)
+
+tracer = Tracer()
+
+def span(name, category="canvas"):
+    return tracer.span(name, category)
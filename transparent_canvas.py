@@ -3,48 +3,55 @@
 # Windows only
 
 import ctypes
-from PySide6.QtWidgets import QWidget, QApplication
-from PySide6.QtCore import Qt, QRect
+from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import Qt
 from PySide6.QtGui import QPainter, QColor
 
+from screen_topology import screen_topology
+
+#Stand-in for the Win32 window-style calls where there is no windll (headless runs on Linux, see benchmarks/)
+#Every window reads as having no extended style and changing it does nothing
+class NoUser32:
+    def GetWindowLongW(self, hwnd, index):
+        return 0
+
+    def SetWindowLongW(self, hwnd, index, style):
+        return 0
+
 # DPI & Transparency Settings
-ctypes.windll.shcore.SetProcessDpiAwareness(2)  # Per-monitor DPI awareness
+if hasattr(ctypes, "windll"):
+    ctypes.windll.shcore.SetProcessDpiAwareness(2)  # Per-monitor DPI awareness
+    user32 = ctypes.windll.user32
+else:
+    user32 = NoUser32()
 
 # Passthrough constants
 GWL_EXSTYLE = -20
 WS_EX_LAYERED = 0x80000
 WS_EX_TRANSPARENT = 0x20
 
-def set_os_passthrough(window, enable: bool):
+#Opaque windows are not layered - click-through needs a layered window, so it is only available when translucent
+def set_os_passthrough(window, enable: bool, layered=True):
     hwnd = int(window.winId())
-    style = ctypes.windll.user32.GetWindowLongW(hwnd, GWL_EXSTYLE)
+    style = user32.GetWindowLongW(hwnd, GWL_EXSTYLE)
+    if not layered:
+        user32.SetWindowLongW(hwnd, GWL_EXSTYLE, style & ~(WS_EX_LAYERED | WS_EX_TRANSPARENT))
+        return
     style |= WS_EX_LAYERED
     if enable:
-        ctypes.windll.user32.SetWindowLongW(hwnd, GWL_EXSTYLE, style | WS_EX_TRANSPARENT)
+        user32.SetWindowLongW(hwnd, GWL_EXSTYLE, style | WS_EX_TRANSPARENT)
     else:
-        ctypes.windll.user32.SetWindowLongW(hwnd, GWL_EXSTYLE, style & ~WS_EX_TRANSPARENT)
+        user32.SetWindowLongW(hwnd, GWL_EXSTYLE, style & ~WS_EX_TRANSPARENT)
 
 class TransparentCanvasWindow(QWidget):
     def __init__(self):
         super().__init__()
 
         self.background_color = QColor(0, 0, 0, 1)  # Default transparent background
+        self.is_opaque = False
 
-        # Calculate full virtual screen geometry manually
-        screens = QApplication.screens()
-        left = top = 99999
-        right = bottom = -99999
-        self.screen_geometries = []
-
-        for screen in screens:
-            g = screen.geometry()
-            self.screen_geometries.append(g)
-            left = min(left, g.left())
-            top = min(top, g.top())
-            right = max(right, g.right())
-            bottom = max(bottom, g.bottom())
-
-        self.virtual_geometry = QRect(left, top, right - left + 1, bottom - top + 1)
+        # Screen geometry comes from the shared topology, which follows hot-plug and DPI changes
+        self.topology = screen_topology()
 
         # Configure canvas window
         self.setGeometry(self.virtual_geometry)
@@ -53,15 +60,42 @@ class TransparentCanvasWindow(QWidget):
         self.setMouseTracking(True)
         set_os_passthrough(self, False)
 
+    @property
+    def screen_geometries(self):
+        return self.topology.geometries
+
+    @property
+    def virtual_geometry(self):
+        return self.topology.virtual_geometry
+
     #Enable and Disable methods called from main.py, menu_ui.py, and background_layer.py
     def enable_passthrough(self):
-        set_os_passthrough(self, True)
+        set_os_passthrough(self, True, layered=not self.is_opaque)
 
     def disable_passthrough(self):
-        set_os_passthrough(self, False)
+        set_os_passthrough(self, False, layered=not self.is_opaque)
+
+    #Solid boards don't need per-pixel alpha - the window gets an opaque backing store and stops being a layered window
+    #The native window has to be recreated for the change, so it is hidden and shown around it
+    #Showing it again puts it on top of the other always-on-top windows - returns True if it was recreated
+    def set_opaque(self, opaque):
+        if opaque == self.is_opaque:
+            return False
+        self.is_opaque = opaque
+        visible = self.isVisible()
+        self.hide()
+        self.setAttribute(Qt.WA_TranslucentBackground, not opaque)
+        self.setAttribute(Qt.WA_OpaquePaintEvent, opaque)
+        self.setWindowFlags(self.windowFlags())
+        set_os_passthrough(self, False, layered=not opaque)
+        if visible:
+            self.show()
+        return True
 
+    #Painter for paintEvent - background is only filled inside the damaged region
     def get_painter(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
-        painter.fillRect(self.rect(), self.background_color)
+        for rect in event.region():
+            painter.fillRect(rect, self.background_color)
         return painter